@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LibraryManagementConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api.library_management"
+
+    def ready(self):
+        from . import lookups, signals  # noqa: F401
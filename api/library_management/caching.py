@@ -0,0 +1,152 @@
+"""
+Response cache for the read-only catalog endpoints.
+
+Every cached response key embeds the current generation of each scope the
+view depends on (usually a model label). Writes bump the generations they
+affect after commit, which orphans the old keys instead of deleting them.
+"""
+
+import functools
+import hashlib
+import logging
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# borrowing and returning only move available_copies
+BOOK_AVAILABILITY = "library_management.book.available_copies"
+
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def scope_for(model):
+    return model._meta.label_lower
+
+
+def _generation_key(scope):
+    return f"generation:{scope}"
+
+
+def get_generations(scopes):
+    keys = [_generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    return [generations.get(key, 0) for key in keys]
+
+
+def bump_generations(*scopes):
+    # runs after the write committed: a cache outage must not turn it into a
+    # 500 that makes the client retry a write that already happened
+    try:
+        for scope in scopes:
+            key = _generation_key(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # missing or evicted: restart from a value no old key can carry
+                cache.set(key, time.time_ns(), timeout=None)
+    except Exception:
+        logger.warning(f"Could not bump cache generations {scopes}", exc_info=True)
+
+
+def bump_generations_on_commit(*scopes):
+    transaction.on_commit(functools.partial(bump_generations, *scopes), robust=True)
+
+
+def cached_response(view_method):
+    """Serve a GET handler from the cache, rebuilding each cold key only once."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            key = self.get_response_cache_key(request)
+            data = cache.get(key)
+        except Exception:
+            logger.warning("Response cache unavailable", exc_info=True)
+            return view_method(self, request, *args, **kwargs)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        lock_key = f"{key}:lock"
+        try:
+            locked = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+            if not locked:
+                # another worker is building this response, give it a moment
+                deadline = time.monotonic() + LOCK_WAIT
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_INTERVAL)
+                    data = cache.get(key)
+                    if data is not None:
+                        return Response(data, headers={"X-Cache": "HIT"})
+        except Exception:
+            logger.warning("Response cache unavailable", exc_info=True)
+            return view_method(self, request, *args, **kwargs)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                try:
+                    cache.set(key, response.data, self.cache_timeout)
+                    response["X-Cache"] = "MISS"
+                except Exception:
+                    logger.warning("Response cache unavailable", exc_info=True)
+        finally:
+            if locked:
+                try:
+                    cache.delete(lock_key)
+                except Exception:
+                    # expires after LOCK_TIMEOUT anyway
+                    logger.warning("Response cache unavailable", exc_info=True)
+        return response
+
+    return wrapper
+
+
+class CachedReadMixin:
+    """
+    Caches ``list`` and ``retrieve`` responses of a viewset.
+
+    ``cache_scopes`` names the generations the responses depend on and
+    ``cache_vary_on_user`` the query parameters that make a response specific
+    to the requesting user.
+    """
+
+    cache_scopes = ()
+    cache_vary_on_user = ()
+    cache_timeout = 300
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def get_response_cache_key(self, request):
+        params = urlencode(
+            [
+                (name, sorted(values))
+                for name, values in sorted(request.query_params.lists())
+            ],
+            doseq=True,
+        )
+        user = ""
+        if request.user.is_authenticated and any(
+            param in request.query_params for param in self.cache_vary_on_user
+        ):
+            user = request.user.pk
+        scopes = self.get_cache_scopes()
+        generations = get_generations(scopes)
+        raw = f"{request.path}?{params}|{user}|" + ",".join(
+            f"{scope}={generation}" for scope, generation in zip(scopes, generations)
+        )
+        return "response:" + hashlib.md5(raw.encode()).hexdigest()
+
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,322 @@
+"""
+Bulk catalog loading for ``manage.py import_catalog``.
+
+Rows are streamed from a CSV or JSONL file in fixed-size batches. Author,
+category and library names are resolved through in-memory ``name -> id``
+maps (missing names are created once per batch), each batch is ``COPY``-ed
+into a temporary staging table and upserted into ``Book`` on its
+``(isbn, library)`` unique constraint in a single statement. Memory is
+bounded by the batch size plus the name maps.
+
+New books start with the file's ``available_copies`` (0 when left blank).
+Books that already exist get their title, author, category and publication
+date from the file, but keep their ``available_copies``: that is a live
+count that borrowings and returns move, and the file cannot know how many
+copies are on loan.
+"""
+
+import csv
+import gzip
+import io
+import json
+import time
+from collections import Counter
+from datetime import date
+
+from django.db import connections, transaction
+
+from .caching import BOOK_AVAILABILITY, bump_generations_on_commit, scope_for
+from .models import Author, Book, Category, Library, refresh_book_counts
+
+CATALOG_COLUMNS = (
+    "isbn",
+    "title",
+    "author",
+    "category",
+    "library",
+    "published_date",
+    "available_copies",
+)
+REQUIRED_COLUMNS = {"isbn", "title", "author", "library", "published_date"}
+STAGING_TABLE = "catalog_import_staging"
+STAGING_COLUMNS = (
+    "line",
+    "isbn",
+    "title",
+    "author_id",
+    "category_id",
+    "library_id",
+    "published_date",
+    "available_copies",
+)
+REPORTED_ERRORS = 50
+# overwritten on existing books; available_copies is only set on insert
+UPSERT_COLUMNS = ("title", "author_id", "category_id", "published_date")
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_catalog(path, file_format=None):
+    """Yield ``(line, row)`` pairs from a CSV or JSONL catalog file."""
+    file_format = file_format or (
+        "jsonl" if path.removesuffix(".gz").endswith((".jsonl", ".ndjson")) else "csv"
+    )
+    with _open(path) as stream:
+        if file_format == "csv":
+            reader = csv.DictReader(stream)
+            missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+            if missing:
+                raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            # decoded in parse_row so one bad line is reported, not fatal
+            for line, text in enumerate(stream, start=1):
+                if text.strip():
+                    yield line, text
+
+
+def parse_row(row):
+    """
+    Validated ``(isbn, title, author, category, library, date, copies)``;
+    ``copies`` is None when left blank.
+    """
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+    values = {column: row.get(column) for column in CATALOG_COLUMNS}
+    if isinstance(values["isbn"], int):
+        values["isbn"] = str(values["isbn"])
+    for column in CATALOG_COLUMNS:
+        if isinstance(values[column], str):
+            values[column] = values[column].strip()
+    for column in REQUIRED_COLUMNS:
+        if values[column] in (None, ""):
+            raise ValueError(f"{column} is required")
+    if len(values["isbn"]) > 13:
+        raise ValueError("isbn is longer than 13 characters")
+    for column in ("title", "author", "category", "library"):
+        if values[column] and len(values[column]) > 255:
+            raise ValueError(f"{column} is longer than 255 characters")
+    copies = values["available_copies"]
+    copies = int(copies) if copies not in (None, "") else None
+    if copies is not None and copies < 0:
+        raise ValueError("available_copies cannot be negative")
+    published_date = values["published_date"]
+    if not isinstance(published_date, date):
+        published_date = date.fromisoformat(published_date)
+    return (
+        values["isbn"],
+        values["title"],
+        values["author"],
+        values["category"] or None,
+        values["library"],
+        published_date,
+        copies,
+    )
+
+
+class NameMap:
+    """``name -> id`` map of a model, creating missing names in bulk."""
+
+    def __init__(self, model, using, dry_run, defaults=None):
+        self.model = model
+        self.using = using
+        self.dry_run = dry_run
+        self.defaults = defaults or {}
+        self.created = 0
+        self.ids = {}
+        # lowest id wins for names that already exist more than once
+        queryset = model._default_manager.using(using).order_by("-id")
+        for name, pk in queryset.values_list("name", "id").iterator(chunk_size=10_000):
+            self.ids[name] = pk
+
+    def resolve(self, names):
+        missing = sorted({name for name in names if name not in self.ids})
+        if not missing:
+            return
+        if self.dry_run:
+            # negative ids never match a stored row
+            for name in missing:
+                self.ids[name] = -(len(self.ids) + 1)
+        else:
+            created = self.model._default_manager.using(self.using).bulk_create(
+                [self.model(name=name, **self.defaults) for name in missing]
+            )
+            for obj in created:
+                self.ids[obj.name] = obj.pk
+        self.created += len(missing)
+
+    def __getitem__(self, name):
+        return None if name is None else self.ids[name]
+
+
+class CatalogImporter:
+    """
+    Loads parsed catalog rows into ``Book``, one transaction per batch.
+
+    With ``dry_run`` nothing outside the staging table is written: names
+    that would be created get placeholder ids and the staged batch is only
+    compared against the stored books.
+    """
+
+    def __init__(self, batch_size=50_000, dry_run=False, using="default"):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.using = using
+        self.stats = Counter()
+        self.errors = []
+        self.authors = NameMap(Author, using, dry_run)
+        self.categories = NameMap(Category, using, dry_run)
+        self.libraries = NameMap(
+            Library, using, dry_run, defaults={"address": "", "phone_number": ""}
+        )
+
+    def run(self, rows, progress=None):
+        """Import ``(line, row)`` pairs, calling ``progress(stats)`` per batch."""
+        self.started = time.perf_counter()
+        self._create_staging_table()
+        batch = []
+        for line, row in rows:
+            self.stats["read"] += 1
+            try:
+                batch.append((line, *parse_row(row)))
+            except (TypeError, ValueError) as error:
+                self.stats["invalid"] += 1
+                if len(self.errors) < REPORTED_ERRORS:
+                    self.errors.append((line, str(error)))
+                continue
+            if len(batch) >= self.batch_size:
+                self._load(batch, progress)
+                batch = []
+        if batch:
+            self._load(batch, progress)
+        self.stats["authors created"] = self.authors.created
+        self.stats["categories created"] = self.categories.created
+        self.stats["libraries created"] = self.libraries.created
+        return self.stats
+
+    def rows_per_second(self):
+        return self.stats["read"] / max(time.perf_counter() - self.started, 1e-9)
+
+    def _create_staging_table(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} ("
+                f" line bigint, isbn varchar(13), title varchar(255),"
+                f" author_id bigint, category_id bigint, library_id bigint,"
+                f" published_date date, available_copies integer)"
+            )
+
+    def _load(self, batch, progress):
+        with transaction.atomic(using=self.using):
+            self.authors.resolve(row[3] for row in batch)
+            self.categories.resolve(row[4] for row in batch if row[4] is not None)
+            self.libraries.resolve(row[5] for row in batch)
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+                self._copy(cursor, batch)
+                if self.dry_run:
+                    self._compare(cursor)
+                else:
+                    self._upsert(cursor)
+        if progress is not None:
+            progress(self.stats)
+
+    def _copy(self, cursor, batch):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for line, isbn, title, author, category, library, published, copies in batch:
+            writer.writerow(
+                (
+                    line,
+                    isbn,
+                    title,
+                    self.authors[author],
+                    self.categories[category],
+                    self.libraries[library],
+                    published.isoformat(),
+                    copies,
+                )
+            )
+        buffer.seek(0)
+        # psycopg2 cursor underneath the Django wrapper
+        cursor.cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN"
+            f" WITH (FORMAT csv)",
+            buffer,
+        )
+
+    def _latest_rows(self):
+        # the last occurrence of an (isbn, library) pair in the batch wins
+        return (
+            f"SELECT DISTINCT ON (isbn, library_id) * FROM {STAGING_TABLE}"
+            f" ORDER BY isbn, library_id, line DESC"
+        )
+
+    def _compare(self, cursor):
+        cursor.execute(
+            f"SELECT count(*) FILTER (WHERE b.id IS NULL),"
+            f" count(*) FILTER (WHERE b.id IS NOT NULL AND"
+            f" ({', '.join(f'b.{c}' for c in UPSERT_COLUMNS)}) IS DISTINCT FROM"
+            f" ({', '.join(f's.{c}' for c in UPSERT_COLUMNS)})),"
+            f" count(b.id)"
+            f" FROM ({self._latest_rows()}) AS s"
+            f" LEFT JOIN {Book._meta.db_table} AS b"
+            f" ON b.isbn = s.isbn AND b.library_id = s.library_id"
+        )
+        inserted, updated, matched = cursor.fetchone()
+        self.stats["inserted"] += inserted
+        self.stats["updated"] += updated
+        self.stats["unchanged"] += matched - updated
+
+    def _upsert(self, cursor):
+        table = Book._meta.db_table
+        cursor.execute(
+            f"SELECT b.author_id FROM {table} AS b JOIN {STAGING_TABLE} AS s"
+            f" ON b.isbn = s.isbn AND b.library_id = s.library_id FOR UPDATE OF b"
+        )
+        previous_authors = {author_id for (author_id,) in cursor.fetchall()}
+        cursor.execute(f"SELECT DISTINCT author_id FROM {STAGING_TABLE}")
+        affected_authors = previous_authors | {pk for (pk,) in cursor.fetchall()}
+        cursor.execute(
+            f"INSERT INTO {table} AS b"
+            f" (isbn, library_id, {', '.join(UPSERT_COLUMNS)}, available_copies,"
+            f" updated_at)"
+            f" SELECT isbn, library_id, {', '.join(UPSERT_COLUMNS)},"
+            f" coalesce(available_copies, 0), now()"
+            f" FROM ({self._latest_rows()}) AS s"
+            f" ON CONFLICT (isbn, library_id) DO UPDATE SET "
+            + ", ".join(f"{c} = EXCLUDED.{c}" for c in (*UPSERT_COLUMNS, "updated_at"))
+            + f" WHERE ({', '.join(f'b.{c}' for c in UPSERT_COLUMNS)})"
+            f" IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in UPSERT_COLUMNS)})"
+            f" RETURNING b.id, b.xmax = 0"
+        )
+        written = cursor.fetchall()
+        inserted = sum(1 for _, is_insert in written if is_insert)
+        self.stats["inserted"] += inserted
+        self.stats["updated"] += len(written) - inserted
+        cursor.execute(
+            f"SELECT count(DISTINCT (isbn, library_id)) FROM {STAGING_TABLE}"
+        )
+        self.stats["unchanged"] += cursor.fetchone()[0] - len(written)
+        if not written:
+            return
+
+        # raw SQL skips BookQuerySet, so redo its bookkeeping here
+        Book.objects.using(self.using).filter(
+            pk__in=[pk for pk, _ in written]
+        ).update_search_vector()
+        refresh_book_counts(affected_authors, using=self.using)
+        bump_generations_on_commit(
+            scope_for(Book),
+            BOOK_AVAILABILITY,
+            scope_for(Author),
+            scope_for(Category),
+            scope_for(Library),
+        )
@@ -0,0 +1,97 @@
+"""
+Conditional GET for list and detail endpoints.
+
+Validators come from a single aggregate per queryset (latest ``updated_at``
+and row count), so a matching ``If-None-Match`` (or, for a single object,
+``If-Modified-Since``) gets a 304 without fetching or serializing the page.
+"""
+
+import functools
+import hashlib
+from datetime import date
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_get(view_method):
+    """Answer matching conditional GETs with 304, tag everything else."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view_method(self, request, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified validation for ``list`` and ``retrieve``.
+
+    Views whose output also depends on rows outside their own queryset add
+    those querysets in ``get_validator_querysets``. Views that render
+    values computed from today's date (overdue flags, penalties) set
+    ``validators_vary_by_date``: the date becomes part of the ETag and no
+    Last-Modified is sent, since no row timestamp tells when such output
+    last changed.
+
+    Lists get no Last-Modified either: their newest ``updated_at`` does not
+    move when a row is deleted or drops out of the filter, nor on a second
+    write within the same second, so only the ETag (which includes the row
+    counts and full timestamps) can validate them.
+    """
+
+    validators_vary_by_date = False
+
+    def get_validator_querysets(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        return [queryset]
+
+    def get_conditional_validators(self, request):
+        states = [
+            queryset.order_by().aggregate(
+                last_modified=Max("updated_at"), count=Count("pk")
+            )
+            for queryset in self.get_validator_querysets()
+        ]
+        timestamps = [
+            state["last_modified"] for state in states if state["last_modified"]
+        ]
+        last_modified = None
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if timestamps and lookup_url_kwarg in self.kwargs:
+            last_modified = int(max(timestamps).timestamp())
+        user = request.user.pk if request.user.is_authenticated else ""
+        raw = f"{request.get_full_path()}|{user}|" + ",".join(
+            f"{state['last_modified'] and state['last_modified'].isoformat()}"
+            f"/{state['count']}"
+            for state in states
+        )
+        if self.validators_vary_by_date:
+            raw += f"|{date.today().isoformat()}"
+            last_modified = None
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest()), last_modified
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
@@ -0,0 +1,69 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin that declares the relations its fields touch.
+
+    ``Meta.select_related`` and ``Meta.prefetch_related`` list this
+    serializer's own relations. Nested serializers using the mixin contribute
+    theirs under their source: single nested objects are joined, nested lists
+    become a ``Prefetch`` carrying the child's own eager loading.
+    """
+
+    @classmethod
+    def get_eager_loading(cls, prefix=""):
+        meta = getattr(cls, "Meta", None)
+        select = [prefix + name for name in getattr(meta, "select_related", [])]
+        prefetch = [prefix + name for name in getattr(meta, "prefetch_related", [])]
+
+        for field_name, field in cls._declared_fields.items():
+            many = isinstance(field, serializers.ListSerializer)
+            child = field.child if many else field
+            if not isinstance(child, EagerLoadingMixin):
+                continue
+            path = prefix + (field.source or field_name)
+            if many:
+                child_select, child_prefetch = child.get_eager_loading()
+                queryset = child.Meta.model.objects.select_related(
+                    *child_select
+                ).prefetch_related(*child_prefetch)
+                prefetch.append(Prefetch(path, queryset=queryset))
+            else:
+                child_select, child_prefetch = child.get_eager_loading(path + "__")
+                select += [path, *child_select]
+                prefetch += child_prefetch
+        return select, prefetch
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Apply the declared relations, keeping prefetches already on the queryset."""
+        select, prefetch = cls.get_eager_loading()
+        existing = {
+            getattr(lookup, "prefetch_to", lookup)
+            for lookup in queryset._prefetch_related_lookups
+        }
+        prefetch = [
+            lookup
+            for lookup in prefetch
+            if getattr(lookup, "prefetch_to", lookup) not in existing
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class EagerLoadingViewSetMixin:
+    """Eager-load whatever the view's serializer declares it will render."""
+
+    def get_queryset(self):
+        return self.with_eager_loading(super().get_queryset())
+
+    def with_eager_loading(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        if issubclass(serializer_class, EagerLoadingMixin):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
@@ -0,0 +1,259 @@
+"""
+Read-only list serialization straight from ``values()`` rows.
+
+A ``FastListEncoder`` is compiled once per serializer class: it maps every
+serializer field to a ``values()`` path (joined names included), picks a
+converter matching the DRF field's ``to_representation`` and encodes a page
+of rows in one ``json.dumps`` call. The result is spliced verbatim into the
+response by ``FastJSONRenderer``, byte-for-byte what the serializer and
+``JSONRenderer`` would have produced.
+
+Serializers opt in by declaring ``Meta.fast_values``: a mapping from field
+name to the ``values()`` path that yields its representation, or to a
+``(paths, function)`` pair for values computed in Python. Fields not listed
+read their own ``source``.
+"""
+
+import json
+from collections import defaultdict
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+# DB values of these fields already are their representation
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.FloatField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+class RawJSON(str):
+    """Already-encoded JSON, spliced verbatim by ``FastJSONRenderer``."""
+
+
+def _encode(data, dumps):
+    if isinstance(data, RawJSON):
+        return data
+    if isinstance(data, dict):
+        return (
+            "{"
+            + ",".join(
+                f"{dumps(str(key))}:{_encode(value, dumps)}"
+                for key, value in data.items()
+            )
+            + "}"
+        )
+    if isinstance(data, (list, tuple)):
+        return "[" + ",".join(_encode(item, dumps) for item in data) + "]"
+    return dumps(data)
+
+
+def _decode(data):
+    if isinstance(data, RawJSON):
+        return json.loads(data)
+    if isinstance(data, dict):
+        return {key: _decode(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_decode(item) for item in data]
+    return data
+
+
+def _contains_raw(data):
+    if isinstance(data, RawJSON):
+        return True
+    if isinstance(data, dict):
+        return any(_contains_raw(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_contains_raw(item) for item in data)
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """``JSONRenderer`` that also accepts ``RawJSON`` fragments in the data."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not _contains_raw(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact:
+            # pretty output (e.g. the browsable API) is rare, re-parse for it
+            return super().render(_decode(data), accepted_media_type, renderer_context)
+        ret = _encode(data, self.dumps)
+        ret = ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+        return ret.encode()
+
+    def dumps(self, data):
+        return json.dumps(
+            data,
+            cls=self.encoder_class,
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=(",", ":"),
+        )
+
+
+def _converter(field, overridden):
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.RelatedField):
+        if not overridden:
+            raise ImproperlyConfigured(
+                f"{field.field_name!r} needs a Meta.fast_values path to its "
+                "representation."
+            )
+        # e.g. a StringRelatedField pointed at the related name column
+        return str
+    return field.to_representation
+
+
+class FastListEncoder:
+    """
+    Row encoder compiled from a serializer's fields.
+
+    ``rows()`` turns a model queryset into the ``values()`` queryset to
+    paginate and ``encode()`` turns a page of it into a ``RawJSON`` list.
+    Nested ``many=True`` serializers are filled from one extra query over the
+    relation, reusing its ``Prefetch`` queryset when the model queryset has
+    one.
+    """
+
+    _compiled = {}
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        if serializer_class not in cls._compiled:
+            cls._compiled[serializer_class] = cls(serializer_class())
+        return cls._compiled[serializer_class]
+
+    def __init__(self, serializer):
+        self.paths = []
+        self.children = []
+        self.build_row = self._compile(serializer, "")
+
+    def _path(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return path
+
+    def _compile(self, serializer, prefix):
+        overrides = getattr(getattr(serializer, "Meta", None), "fast_values", {})
+        getters = []
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                getters.append((name, self._compile_children(serializer, name, field)))
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                getters.append(
+                    (name, self._compile(field, f"{prefix}{field.source}__"))
+                )
+                continue
+            spec = overrides.get(name, field.source)
+            if isinstance(spec, str):
+                convert = _converter(field, name in overrides)
+                getters.append((name, self._field_getter(prefix + spec, convert)))
+            else:
+                paths, function = spec
+                getters.append((name, self._computed_getter(prefix, paths, function)))
+
+        def build_row(row):
+            return {name: getter(row) for name, getter in getters}
+
+        return build_row
+
+    def _field_getter(self, path, convert):
+        path = self._path(path)
+        if convert is None:
+            return lambda row: row[path]
+        return lambda row: None if row[path] is None else convert(row[path])
+
+    def _computed_getter(self, prefix, paths, function):
+        paths = [self._path(prefix + path) for path in paths]
+        return lambda row: function(*(row[path] for path in paths))
+
+    def _compile_children(self, serializer, name, field):
+        # nested lists come from one extra query keyed on the reverse FK
+        relation = serializer.Meta.model._meta.get_field(field.source or name)
+        child = FastListEncoder(field.child)
+        child.relation = relation
+        child.field_name = name
+        self.children.append(child)
+        parent_path = self._path("pk")
+        return lambda row: row["_children"][name].get(row[parent_path], [])
+
+    def rows(self, queryset):
+        """``values()`` queryset carrying every column the encoder needs."""
+        return queryset.prefetch_related(None).values(*self.paths)
+
+    def encode(self, rows, queryset=None):
+        """Encode ``values()`` rows, ``queryset`` supplying nested prefetches."""
+        return RawJSON(FastJSONRenderer().dumps(self.build_rows(rows, queryset)))
+
+    def build_rows(self, rows, queryset=None):
+        """Representations of ``values()`` rows, as the serializer returns them."""
+        rows = list(rows)
+        children = {}
+        if rows and self.children:
+            prefetches = {}
+            if queryset is not None:
+                prefetches = {
+                    getattr(lookup, "prefetch_to", lookup): lookup
+                    for lookup in queryset._prefetch_related_lookups
+                }
+            parent_ids = [row["pk"] for row in rows]
+            for child in self.children:
+                children[child.field_name] = child.grouped(
+                    prefetches.get(child.field_name), parent_ids
+                )
+        data = []
+        for row in rows:
+            row["_children"] = children
+            data.append(self.build_row(row))
+        return data
+
+    def grouped(self, prefetch, parent_ids):
+        related_model = self.relation.related_model
+        fk = self.relation.field.attname
+        queryset = getattr(prefetch, "queryset", None)
+        if queryset is None:
+            queryset = related_model._default_manager.all()
+        grouped = defaultdict(list)
+        for row in queryset.filter(**{f"{fk}__in": parent_ids}).values(fk, *self.paths):
+            grouped[row[fk]].append(self.build_row(row))
+        return grouped
+
+
+class FastListMixin:
+    """
+    Serves ``list`` from ``FastListEncoder`` when the response is rendered by
+    ``FastJSONRenderer``; other renderers keep the serializer path.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.list_response(queryset)
+
+    def list_response(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        if not isinstance(self.request.accepted_renderer, FastJSONRenderer):
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = serializer_class(
+                    page, many=True, context=self.get_serializer_context()
+                )
+                return self.get_paginated_response(serializer.data)
+            serializer = serializer_class(
+                queryset, many=True, context=self.get_serializer_context()
+            )
+            return Response(serializer.data)
+
+        encoder = FastListEncoder.for_serializer(serializer_class)
+        rows = encoder.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(encoder.encode(page, queryset))
+        return Response(encoder.encode(rows, queryset))
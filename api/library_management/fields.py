@@ -0,0 +1,30 @@
+from rest_framework import serializers
+
+
+class PrimaryKeyListField(serializers.ListField):
+    """
+    A list of primary keys resolved to model instances with one ``id__in``
+    query, unlike a ``ListField`` of ``PrimaryKeyRelatedField`` which runs a
+    SELECT per id. Unknown ids are reported together; the instances come back
+    in input order, duplicates included.
+    """
+
+    default_error_messages = {
+        "does_not_exist": 'Invalid pk(s) "{pk_values}" - object does not exist.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        kwargs.setdefault("child", serializers.IntegerField(min_value=1))
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        instances = self.get_queryset().in_bulk(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in instances]
+        if missing:
+            self.fail("does_not_exist", pk_values=", ".join(map(str, missing)))
+        return [instances[pk] for pk in pks]
@@ -1,24 +1,38 @@
 import django_filters
 from django_filters import rest_framework as filters
-from .models import Book, Author, Library, Category
+from .models import Book, Author, Library, Category, SEARCH_CONFIG
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, OuterRef
 
 
 class BookFilter(django_filters.FilterSet):
+    q = django_filters.CharFilter(method="filter_search")
+    title = django_filters.CharFilter(field_name="title", lookup_expr="trgm_icontains")
     category = django_filters.CharFilter(
-        field_name="category__name", lookup_expr="icontains"
+        field_name="category__name", lookup_expr="trgm_icontains"
     )
     author = django_filters.CharFilter(
-        field_name="author__name", lookup_expr="icontains"
+        field_name="author__name", lookup_expr="trgm_icontains"
     )
     library = django_filters.CharFilter(
-        field_name="library__name", lookup_expr="icontains"
+        field_name="library__name", lookup_expr="trgm_icontains"
     )
 
     class Meta:
         model = Book
-        fields = ["category", "author", "library"]
+        fields = ["q", "title", "category", "author", "library"]
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        query = SearchQuery(value, search_type="websearch", config=SEARCH_CONFIG)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "id")
+        )
 
 
 class AuthorFilter(django_filters.FilterSet):
@@ -29,26 +43,38 @@ class AuthorFilter(django_filters.FilterSet):
         model = Author
         fields = ["library", "category"]
 
+    # Both parameters scope the book counts rather than the authors, which
+    # AuthorViewSet.get_queryset already does from the maintained counters.
     def filter_by_library(self, queryset, name, value):
-        return Author.get_filtered_authors({"library": value})
+        return queryset
 
     def filter_by_category(self, queryset, name, value):
-        return Author.get_filtered_authors({"category": value})
+        return queryset
 
 
 class LibraryFilter(filters.FilterSet):
     radius = filters.NumberFilter(method="filter_by_user_location")
-    category = filters.CharFilter(
-        field_name="books__category__name", lookup_expr="icontains"
-    )
-    author = filters.CharFilter(
-        field_name="books__author__name", lookup_expr="icontains"
-    )
+    category = filters.CharFilter(method="filter_by_category")
+    author = filters.CharFilter(method="filter_by_author")
 
     class Meta:
         model = Library
         fields = ["category", "author", "radius"]
 
+    # EXISTS instead of a join to books: one row per library, and each probe
+    # is a (library_id, category_id / author_id) index lookup
+    def filter_by_category(self, queryset, name, value):
+        categories = Category.objects.filter(name__trgm_icontains=value).values("id")
+        return queryset.filter(
+            Exists(Book.objects.filter(library=OuterRef("pk"), category__in=categories))
+        )
+
+    def filter_by_author(self, queryset, name, value):
+        authors = Author.objects.filter(name__trgm_icontains=value).values("id")
+        return queryset.filter(
+            Exists(Book.objects.filter(library=OuterRef("pk"), author__in=authors))
+        )
+
     def filter_by_user_location(self, queryset, name, value):
         try:
             user = self.request.user
@@ -61,12 +87,7 @@ class LibraryFilter(filters.FilterSet):
 
             radius = float(value or 10)
 
-            return (
-                queryset.filter(location__isnull=False)
-                .annotate(distance=Distance("location", user_location))
-                .filter(distance__lte=radius * 1000)
-                .order_by("distance")
-            )
+            return queryset.within_radius(user_location, radius)
 
         except (ValueError, AttributeError):
             return queryset
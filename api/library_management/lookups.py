@@ -0,0 +1,22 @@
+from django.db.models import CharField, Lookup
+
+
+@CharField.register_lookup
+class TrigramIContains(Lookup):
+    """
+    Case-insensitive substring match compiled to ``col ILIKE '%value%'``.
+
+    The built-in ``icontains`` compiles to ``UPPER(col::text) LIKE UPPER(...)``,
+    which a ``gin_trgm_ops`` index on the bare column cannot serve.
+    """
+
+    lookup_name = "trgm_icontains"
+    prepare_rhs = False
+
+    def get_db_prep_lookup(self, value, connection):
+        return "%s", [f"%{connection.ops.prep_for_like_query(value)}%"]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} ILIKE {rhs}", (*lhs_params, *rhs_params)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from api.library_management.models import Book
+
+
+class Command(BaseCommand):
+    help = "Build the full-text search vectors of existing books in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Rebuild every vector, not only the missing ones",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        queryset = Book.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        last_id = 0
+        total = 0
+        while True:
+            # walk the primary key so each batch is an index range scan
+            ids = list(
+                queryset.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += Book.objects.filter(id__in=ids).update_search_vector()
+            last_id = ids[-1]
+            self.stdout.write(f"Updated {total} books (last id {last_id})")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Search vectors built for {total} books.")
+        )
@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.library_management.models import Book
+from api.library_management.synthetic import seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ISBN availability lookups done one /books/?title= request per "
+        "title with a single POST /books/availability/. Run against a scratch "
+        "database: --seed inserts synthetic rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Books to insert first")
+        parser.add_argument("--isbns", type=int, default=50, help="ISBNs per lookup")
+        parser.add_argument("--rounds", type=int, default=10)
+
+    @override_settings(ALLOWED_HOSTS=["testserver"])
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.stdout.write(f"Seeding {options['seed']} books...")
+            seed_catalog(books=options["seed"])
+
+        per_round = options["isbns"]
+        # fresh titles every round so the response cache stays cold
+        sample = list(
+            Book.objects.order_by("?").values_list("isbn", "title")[
+                : per_round * options["rounds"]
+            ]
+        )
+        if len(sample) < per_round:
+            raise CommandError("Not enough books; use --seed.")
+        rounds = [
+            sample[start : start + per_round]
+            for start in range(0, len(sample) - per_round + 1, per_round)
+        ]
+
+        client = APIClient()
+        per_title = batched = 0.0
+        for books in rounds:
+            started = time.perf_counter()
+            for _, title in books:
+                response = client.get("/api/v1/books/", {"title": title})
+                if response.status_code != 200:
+                    raise CommandError(f"GET /books/ returned {response.status_code}")
+            per_title += time.perf_counter() - started
+
+            started = time.perf_counter()
+            response = client.post(
+                "/api/v1/books/availability/",
+                {"isbns": [isbn for isbn, _ in books]},
+                format="json",
+            )
+            if response.status_code != 200:
+                raise CommandError(f"POST returned {response.status_code}")
+            batched += time.perf_counter() - started
+
+        looked_up = len(rounds) * per_round
+        self.stdout.write(f"Books in table: {Book.objects.count()}")
+        self.stdout.write(
+            f"per-title GET  {looked_up / per_title:>10.1f} ISBNs/s "
+            f"({per_title / len(rounds) * 1000:.1f} ms per {per_round} ISBNs)"
+        )
+        self.stdout.write(
+            f"batched POST   {looked_up / batched:>10.1f} ISBNs/s "
+            f"({batched / len(rounds) * 1000:.1f} ms per {per_round} ISBNs)"
+        )
@@ -0,0 +1,72 @@
+import os
+import resource
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api.library_management.catalog_import import CatalogImporter, read_catalog
+from api.library_management.models import (
+    Author,
+    AuthorCategoryBookCount,
+    AuthorLibraryBookCount,
+    Book,
+)
+from api.library_management.synthetic import write_catalog_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a synthetic catalog file twice (fresh load, then a no-op "
+        "re-import) and check the resulting rows and counters. Run against a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--batch-size", type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        suffix = f".{options['format']}"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as file:
+            path = file.name
+        try:
+            started = time.perf_counter()
+            write_catalog_file(path, rows, file_format=options["format"])
+            self.stdout.write(
+                f"Wrote {rows} rows ({os.path.getsize(path) / 2**20:.0f} MiB) "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
+            books_before = Book.objects.count()
+            first = self.run_import(path, options, "fresh load")
+            second = self.run_import(path, options, "re-import")
+        finally:
+            os.unlink(path)
+
+        written = first["inserted"] + first["updated"]
+        if Book.objects.count() != books_before + first["inserted"]:
+            raise CommandError("Book row count does not match the import stats.")
+        if written + first["unchanged"] != rows or second["unchanged"] != rows:
+            raise CommandError(f"Unexpected import stats: {first} / {second}")
+        drift = (
+            Author.objects.book_count_drift()
+            + AuthorLibraryBookCount.objects.drift()
+            + AuthorCategoryBookCount.objects.drift()
+        )
+        if drift:
+            raise CommandError(f"{drift} book counters drifted during the import.")
+        self.stdout.write(self.style.SUCCESS("Import results and counters check out."))
+
+    def run_import(self, path, options, label):
+        importer = CatalogImporter(batch_size=options["batch_size"])
+        started = time.perf_counter()
+        stats = importer.run(read_catalog(path, options["format"]))
+        elapsed = time.perf_counter() - started
+        # ru_maxrss is in KiB on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(
+            f"{label:<11} {elapsed:>8.1f} s {stats['read'] / elapsed:>9.0f} rows/s "
+            f"inserted {stats['inserted']} updated {stats['updated']} "
+            f"unchanged {stats['unchanged']}, peak RSS {peak:.0f} MiB"
+        )
+        return stats
@@ -0,0 +1,77 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from api.library_management.fast_serialization import FastJSONRenderer, FastListEncoder
+from api.library_management.models import Author, Book
+from api.library_management.serializers import BookSerializer, AuthorWithBooksSerializer
+from api.library_management.synthetic import seed_catalog
+from api.records.models import BorrowingRecord
+from api.records.serializers import BorrowingRecordOutputSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list page throughput of the DRF serializers and the values() "
+        "fast path, checking both render the same bytes. Run against a scratch "
+        "database: --seed inserts synthetic rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Books to insert first")
+        parser.add_argument(
+            "--page-sizes", type=int, nargs="+", default=[20, 100, 1000]
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.stdout.write(f"Seeding {options['seed']} books...")
+            seed_catalog(books=options["seed"])
+
+        cases = [
+            ("Books", Book.objects.all(), BookSerializer),
+            (
+                "Authors with books",
+                Author.get_authors_with_books(books_limit=10),
+                AuthorWithBooksSerializer,
+            ),
+            (
+                "Borrowings",
+                BorrowingRecord.objects.all(),
+                BorrowingRecordOutputSerializer,
+            ),
+        ]
+        self.stdout.write(f"Books in table: {Book.objects.count()}")
+        for label, queryset, serializer_class in cases:
+            queryset = serializer_class.setup_eager_loading(queryset).order_by("id")
+            encoder = FastListEncoder.for_serializer(serializer_class)
+            for page_size in options["page_sizes"]:
+                page = queryset[:page_size]
+
+                def serializer_page():
+                    data = serializer_class(page.all(), many=True).data
+                    return JSONRenderer().render(data)
+
+                def fast_page():
+                    rows = encoder.rows(queryset)[:page_size]
+                    return FastJSONRenderer().render(encoder.encode(rows, queryset))
+
+                expected, actual = serializer_page(), fast_page()
+                if expected != actual:
+                    raise CommandError(
+                        f"{label}: fast path output differs at {page_size}"
+                    )
+                rows = len(page)
+                slow = self.pages_per_second(serializer_page, options["repeat"])
+                fast = self.pages_per_second(fast_page, options["repeat"])
+                self.stdout.write(
+                    f"{label:<20} {page_size:>5}/page {rows:>5} rows "
+                    f"serializer {slow:>9.1f} pages/s  fast {fast:>9.1f} pages/s  "
+                    f"x{fast / slow:.1f}"
+                )
+
+    def pages_per_second(self, render_page, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            render_page()
+        return repeat / (time.perf_counter() - started)
@@ -0,0 +1,81 @@
+import statistics
+import time
+from django.contrib.gis.db.models.functions import Distance
+from django.core.management.base import BaseCommand, CommandError
+from api.library_management.models import Library
+from api.library_management.synthetic import seed_libraries
+
+# roughly Germany: 100k libraries leave a few dozen within 10 km of any point
+DEFAULT_BBOX = (5.9, 47.3, 15.0, 55.0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency percentiles of Distance filtering, ST_DWithin radius "
+        "search and KNN nearest-N queries. Run against a scratch database: "
+        "--seed inserts synthetic libraries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Libraries to insert first"
+        )
+        parser.add_argument(
+            "--bbox", type=float, nargs=4, default=DEFAULT_BBOX, metavar="DEG"
+        )
+        parser.add_argument("--radius", type=float, default=10, help="Radius in km")
+        parser.add_argument("--nearest", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.stdout.write(f"Seeding {options['seed']} libraries...")
+            seed_libraries(options["seed"], bbox=options["bbox"])
+
+        # query from existing branches so every radius has something in it
+        points = list(
+            Library.objects.filter(location__isnull=False)
+            .order_by("?")
+            .values_list("location", flat=True)[: options["queries"]]
+        )
+        if not points:
+            raise CommandError("No libraries with a location; use --seed.")
+
+        radius = options["radius"]
+        cases = [
+            (
+                "Distance filter",
+                lambda point: Library.objects.filter(location__isnull=False)
+                .annotate(distance=Distance("location", point))
+                .filter(distance__lte=radius * 1000)
+                .order_by("distance"),
+            ),
+            (
+                "ST_DWithin",
+                lambda point: Library.objects.within_radius(point, radius),
+            ),
+            (
+                f"KNN nearest {options['nearest']}",
+                lambda point: Library.objects.nearest(point)[: options["nearest"]],
+            ),
+        ]
+        self.stdout.write(
+            f"Libraries in table: {Library.objects.count()}, "
+            f"{len(points)} queries, radius {radius:g} km"
+        )
+        for label, build in cases:
+            plan = build(points[0]).explain()
+            if options["verbosity"] > 1:
+                self.stdout.write(plan)
+            scan = "index scan" if "Index Scan" in plan else "seq scan"
+            timings, rows = [], 0
+            for point in points:
+                started = time.perf_counter()
+                rows += len(build(point))
+                timings.append((time.perf_counter() - started) * 1000)
+            percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+            self.stdout.write(
+                f"{label:<16} {scan:<11} {rows / len(points):>8.1f} rows/query "
+                f"p50 {percentiles[49]:>8.2f} ms  p95 {percentiles[94]:>8.2f} ms  "
+                f"max {max(timings):>8.2f} ms"
+            )
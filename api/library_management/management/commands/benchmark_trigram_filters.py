@@ -0,0 +1,49 @@
+import time
+from django.core.management.base import BaseCommand
+from api.library_management.models import Author, Book, Category, Library
+from api.library_management.synthetic import seed_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query plans of icontains and trigram-indexed name filters. "
+        "Run against a scratch database: --seed inserts synthetic rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Books to insert first")
+        parser.add_argument("--pattern", default="a3f2")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.stdout.write(f"Seeding {options['seed']} books...")
+            seed_catalog(books=options["seed"])
+
+        pattern = options["pattern"]
+        cases = [
+            ("Book.title", Book.objects.all(), "title"),
+            ("Author.name", Author.objects.all(), "name"),
+            ("Library.name", Library.objects.all(), "name"),
+            ("Category.name", Category.objects.all(), "name"),
+            ("Book by author name", Book.objects.all(), "author__name"),
+        ]
+        self.stdout.write(f"Books in table: {Book.objects.count()}")
+        for label, queryset, field in cases:
+            for lookup in ("icontains", "trgm_icontains"):
+                filtered = queryset.filter(**{f"{field}__{lookup}": pattern})
+                plan = filtered.explain(analyze=True)
+                started = time.perf_counter()
+                rows = len(filtered.values_list("pk", flat=True))
+                elapsed = (time.perf_counter() - started) * 1000
+                if "Bitmap Index Scan" in plan:
+                    scan = "bitmap index scan"
+                elif "Seq Scan" in plan:
+                    scan = "seq scan"
+                else:
+                    scan = "other"
+                self.stdout.write(
+                    f"{label:<22} {lookup:<15} {scan:<18} {rows:>8} rows "
+                    f"{elapsed:>10.2f} ms"
+                )
+                if options["verbosity"] > 1:
+                    self.stdout.write(plan)
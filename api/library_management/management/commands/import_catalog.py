@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.library_management.catalog_import import CatalogImporter, read_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL catalog into Book, upserting on (isbn, library). "
+        "Columns: isbn, title, author, category, library, published_date, "
+        "available_copies. available_copies only seeds new books; existing "
+        "ones keep their live count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Catalog file, optionally gzipped")
+        parser.add_argument("--format", choices=["csv", "jsonl"])
+        parser.add_argument("--batch-size", type=int, default=50_000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and report what would change without writing",
+        )
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(
+            batch_size=options["batch_size"], dry_run=options["dry_run"]
+        )
+
+        def progress(stats):
+            self.stdout.write(
+                f"{stats['read']} rows read, {stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['unchanged']} unchanged, "
+                f"{stats['invalid']} invalid "
+                f"({importer.rows_per_second():.0f} rows/s)"
+            )
+
+        try:
+            stats = importer.run(
+                read_catalog(options["path"], options["format"]), progress
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for line, error in importer.errors:
+            self.stderr.write(f"line {line}: {error}")
+        if stats["invalid"] > len(importer.errors):
+            self.stderr.write(
+                f"... {stats['invalid'] - len(importer.errors)} more invalid rows"
+            )
+        for label in ("authors", "categories", "libraries"):
+            self.stdout.write(f"{label} created: {stats[f'{label} created']}")
+        message = (
+            f"{stats['inserted']} inserted, {stats['updated']} updated, "
+            f"{stats['unchanged']} unchanged, {stats['invalid']} invalid."
+        )
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(f"Dry run, nothing written: {message}")
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Catalog imported: {message}"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.library_management.models import (
+    Author,
+    AuthorLibraryBookCount,
+    AuthorCategoryBookCount,
+    refresh_book_counts,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized per-author book counters, or verify their drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report drift; exit with an error if any counter is wrong",
+        )
+
+    def drift(self):
+        return {
+            "author totals": Author.objects.book_count_drift(),
+            "author/library counts": AuthorLibraryBookCount.objects.drift(),
+            "author/category counts": AuthorCategoryBookCount.objects.drift(),
+        }
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            drift = self.drift()
+            for label, rows in drift.items():
+                self.stdout.write(f"{label}: {rows} drifted")
+            if any(drift.values()):
+                raise CommandError("Book counters have drifted.")
+            self.stdout.write(self.style.SUCCESS("Book counters are consistent."))
+            return
+
+        with transaction.atomic():
+            refresh_book_counts()
+        self.stdout.write(self.style.SUCCESS("Book counters rebuilt."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_management', '0003_book_available_copies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='isbn',
+            field=models.CharField(max_length=13),
+        ),
+        migrations.AlterUniqueTogether(
+            name='book',
+            unique_together={('isbn', 'library')},
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_gin'),
+        ),
+    ]
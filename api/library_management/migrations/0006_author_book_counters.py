@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POPULATE_COUNTERS = """
+UPDATE library_management_author AS a SET total_books = (
+    SELECT count(*) FROM library_management_book AS b WHERE b.author_id = a.id
+);
+INSERT INTO library_management_authorlibrarybookcount (author_id, library_id, book_count)
+SELECT author_id, library_id, count(*) FROM library_management_book
+GROUP BY author_id, library_id;
+INSERT INTO library_management_authorcategorybookcount (author_id, category_id, book_count)
+SELECT author_id, category_id, count(*) FROM library_management_book
+WHERE category_id IS NOT NULL
+GROUP BY author_id, category_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_management', '0005_trigram_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='total_books',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='AuthorCategoryBookCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_book_counts', to='library_management.author')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_book_counts', to='library_management.category')),
+            ],
+            options={
+                'unique_together': {('author', 'category')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorLibraryBookCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_count', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_book_counts', to='library_management.author')),
+                ('library', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_book_counts', to='library_management.library')),
+            ],
+            options={
+                'unique_together': {('author', 'library')},
+            },
+        ),
+        migrations.RunSQL(POPULATE_COUNTERS, migrations.RunSQL.noop),
+    ]
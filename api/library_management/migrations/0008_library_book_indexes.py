@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_management', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['library', 'category'], name='book_library_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['library', 'author'], name='book_library_author_idx'),
+        ),
+    ]
@@ -1,5 +1,51 @@
-from django.db import models
+from collections import Counter
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce, Now, RowNumber
 from django.contrib.gis.db import models as gis_models
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from .spatial import KNNDistance
+
+SEARCH_CONFIG = "english"
+SEARCH_VECTOR_SOURCE_FIELDS = {
+    "title",
+    "author",
+    "author_id",
+    "category",
+    "category_id",
+}
+COUNTER_KEY_FIELDS = ("author_id", "library_id", "category_id")
+COUNTED_FIELDS = {"author", "library", "category", *COUNTER_KEY_FIELDS}
+
+
+class LibraryQuerySet(models.QuerySet):
+    # both go through the GiST index Django creates on the geography column
+
+    def within_radius(self, point, radius_km):
+        """Libraries within ``radius_km`` of ``point`` (ST_DWithin), nearest first."""
+        return (
+            self.filter(location__dwithin=(point, D(km=radius_km)))
+            .annotate(distance=Distance("location", point))
+            .order_by("distance")
+        )
+
+    def with_available_copy(self, isbn):
+        """Libraries holding an available copy of ``isbn``, with that book row."""
+        # (isbn, library) is unique, so the join never repeats a library
+        return self.filter(books__isbn=isbn, books__available_copies__gt=0).annotate(
+            book_id=models.F("books__id"),
+            available_copies=models.F("books__available_copies"),
+        )
+
+    def nearest(self, point):
+        """Libraries by KNN distance to ``point``, slice it to the N wanted."""
+        return (
+            self.filter(location__isnull=False)
+            .annotate(distance=Distance("location", point))
+            .order_by(KNNDistance("location", point))
+        )
 
 
 class Library(models.Model):
@@ -7,12 +53,86 @@ class Library(models.Model):
     address = models.CharField(max_length=255)
     phone_number = models.CharField(max_length=20)
     location = gis_models.PointField(geography=True, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LibraryQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
     class Meta:
         verbose_name_plural = "Libraries"
+        indexes = [
+            GinIndex(
+                fields=["name"], name="library_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+            # Max("updated_at") of the conditional GET validators
+            models.Index(fields=["updated_at"], name="library_updated_at_idx"),
+        ]
+
+
+class BookQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        """Rebuild the stored search vector for every book in the queryset."""
+        return self.update(search_vector=Book.search_vector_expression())
+
+    def counter_keys(self):
+        """Number of books per (author_id, library_id, category_id)."""
+        return Counter(
+            {
+                (author_id, library_id, category_id): count
+                for author_id, library_id, category_id, count in self.order_by()
+                .values_list(*COUNTER_KEY_FIELDS)
+                .annotate(count=models.Count("pk"))
+            }
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        conflicts = kwargs.get("ignore_conflicts") or kwargs.get("update_conflicts")
+        with transaction.atomic(using=self.db):
+            if conflicts:
+                # rows hitting (isbn, library) are skipped or reassigned, so
+                # recount every author involved instead of trusting the objs
+                affected_authors = {obj.author_id for obj in objs} | set(
+                    self.model.objects.filter(
+                        isbn__in={obj.isbn for obj in objs}
+                    ).values_list("author_id", flat=True)
+                )
+            created = super().bulk_create(objs, *args, **kwargs)
+            if conflicts:
+                refresh_book_counts(affected_authors, using=self.db)
+            else:
+                apply_book_count_deltas(
+                    Counter(book.counter_key for book in created), using=self.db
+                )
+            pks = [obj.pk for obj in created if obj.pk is not None]
+            if pks:
+                self.model.objects.filter(pk__in=pks).update_search_vector()
+        return created
+
+    def update(self, **kwargs):
+        # bulk_update() funnels through here as well
+        if kwargs.keys() - {"search_vector"}:
+            # auto_now only fires on save(), keep conditional GETs honest
+            kwargs.setdefault("updated_at", Now())
+        touched = kwargs.keys()
+        if not (COUNTED_FIELDS | SEARCH_VECTOR_SOURCE_FIELDS) & touched:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            updated = self.model.objects.filter(
+                pk__in=list(self.values_list("pk", flat=True))
+            )
+            if COUNTED_FIELDS & touched:
+                before = updated.counter_keys()
+            rows = super().update(**kwargs)
+            if COUNTED_FIELDS & touched:
+                deltas = updated.counter_keys()
+                deltas.subtract(before)
+                apply_book_count_deltas(deltas, using=self.db)
+            if SEARCH_VECTOR_SOURCE_FIELDS & touched:
+                updated.update_search_vector()
+        return rows
 
 
 class Book(models.Model):
@@ -25,64 +145,217 @@ class Book(models.Model):
     published_date = models.DateField()
     available_copies = models.PositiveIntegerField(default=0)
     isbn = models.CharField(max_length=13)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(COUNTER_KEY_FIELDS).issubset(field_names):
+            instance._loaded_counter_key = instance.counter_key
+        return instance
+
+    @property
+    def counter_key(self):
+        return tuple(getattr(self, field) for field in COUNTER_KEY_FIELDS)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not COUNTED_FIELDS & set(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous = self._stored_counter_key()
+            super().save(*args, **kwargs)
+            current = self.counter_key
+            if previous != current:
+                deltas = Counter({current: 1})
+                if previous is not None:
+                    deltas[previous] -= 1
+                apply_book_count_deltas(deltas)
+            self._loaded_counter_key = current
+
+    def _stored_counter_key(self):
+        """Counter key of the row as currently stored, None if it doesn't exist."""
+        if self.pk is None:
+            return None
+        if not self._state.adding and hasattr(self, "_loaded_counter_key"):
+            return self._loaded_counter_key
+        return Book.objects.filter(pk=self.pk).values_list(*COUNTER_KEY_FIELDS).first()
+
+    @staticmethod
+    def search_vector_expression():
+        """Weighted tsvector over the title, author name and category name."""
+        author_name = models.Subquery(
+            Author.objects.filter(pk=models.OuterRef("author_id")).values("name")
+        )
+        category_name = models.Subquery(
+            Category.objects.filter(pk=models.OuterRef("category_id"))
+            .order_by()
+            .values("name")
+        )
+        return (
+            SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector(author_name, weight="B", config=SEARCH_CONFIG)
+            + SearchVector(category_name, weight="C", config=SEARCH_CONFIG)
+        )
 
     def __str__(self):
         return self.title
 
     class Meta:
         unique_together = ("isbn", "library")
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_gin"),
+            # EXISTS probes of LibraryFilter's category and author filters
+            models.Index(
+                fields=["library", "category"], name="book_library_category_idx"
+            ),
+            models.Index(fields=["library", "author"], name="book_library_author_idx"),
+            GinIndex(
+                fields=["title"], name="book_title_trgm", opclasses=["gin_trgm_ops"]
+            ),
+            # Max("updated_at") of the conditional GET validators
+            models.Index(fields=["updated_at"], name="book_updated_at_idx"),
+        ]
+
+
+class AuthorQuerySet(models.QuerySet):
+    def apply_book_count_deltas(self, deltas):
+        """Add ``{author_id: change}`` to the stored book totals."""
+        deltas = sorted((pk, n) for pk, n in deltas.items() if n)
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(deltas))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS t"
+                f" SET total_books = GREATEST(t.total_books + v.delta, 0)"
+                f" FROM (VALUES {values}) AS v(id, delta) WHERE t.id = v.id",
+                [param for delta in deltas for param in delta],
+            )
+
+    def actual_book_count(self):
+        return Coalesce(
+            models.Subquery(
+                Book.objects.filter(author=models.OuterRef("pk"))
+                .order_by()
+                .values("author")
+                .annotate(count=models.Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+    def rebuild_book_counts(self):
+        return self.update(total_books=self.actual_book_count())
+
+    def book_count_drift(self):
+        return (
+            self.annotate(actual_books=self.actual_book_count())
+            .exclude(total_books=models.F("actual_books"))
+            .count()
+        )
 
 
 class Author(models.Model):
     name = models.CharField(max_length=255)
+    total_books = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AuthorQuerySet.as_manager()
+
+    @staticmethod
+    def _filter_book_sources(filters):
+        """Library and category id subqueries matching the name filters."""
+        libraries = categories = None
+        if "library" in filters:
+            libraries = Library.objects.filter(
+                name__trgm_icontains=filters["library"]
+            ).values("id")
+        if "category" in filters:
+            categories = Category.objects.filter(
+                name__trgm_icontains=filters["category"]
+            ).values("id")
+        return libraries, categories
+
+    @staticmethod
+    def _book_count(libraries, categories):
+        if libraries is not None and categories is not None:
+            # the rollups are per single dimension, count the intersection live
+            return models.Count(
+                "books",
+                filter=models.Q(
+                    books__library__in=libraries, books__category__in=categories
+                ),
+                distinct=True,
+            )
+        if libraries is not None:
+            return AuthorLibraryBookCount.objects.sum_for_author(library__in=libraries)
+        if categories is not None:
+            return AuthorCategoryBookCount.objects.sum_for_author(
+                category__in=categories
+            )
+        return models.F("total_books")
 
     @classmethod
     def get_filtered_authors(cls, filters=None):
-        filter_conditions = {}
-        if filters:
-            if "library" in filters:
-                filter_conditions["books__library__name__icontains"] = filters[
-                    "library"
-                ]
-            if "category" in filters:
-                filter_conditions["books__category__name__icontains"] = filters[
-                    "category"
-                ]
-
-        return cls.objects.annotate(
-            book_count=models.Count(
-                "books", filter=models.Q(**filter_conditions), distinct=True
-            )
-        )
+        libraries, categories = cls._filter_book_sources(filters or {})
+        return cls.objects.annotate(book_count=cls._book_count(libraries, categories))
 
     @classmethod
-    def get_authors_with_books(cls, filters=None):
-        queryset = cls.objects.prefetch_related(
-            models.Prefetch(
-                "books", queryset=Book.objects.select_related("category", "library")
+    def get_authors_with_books(cls, filters=None, books_limit=None):
+        """
+        Authors having at least one book matching the filters, each with only
+        those books prefetched (the first ``books_limit`` by id when given).
+        """
+        libraries, categories = cls._filter_book_sources(filters or {})
+        books = Book.objects.all()
+        if libraries is not None:
+            books = books.filter(library__in=libraries)
+        if categories is not None:
+            books = books.filter(category__in=categories)
+
+        queryset = cls.objects.all()
+        if libraries is not None or categories is not None:
+            queryset = queryset.filter(
+                models.Exists(books.filter(author=models.OuterRef("pk")))
             )
-        )
 
-        if filters:
-            if "library" in filters:
-                queryset = queryset.filter(
-                    books__library__name__icontains=filters["library"]
-                )
-            if "category" in filters:
-                queryset = queryset.filter(
-                    books__category__name__icontains=filters["category"]
+        if books_limit is not None:
+            books = books.annotate(
+                author_rank=models.Window(
+                    RowNumber(),
+                    partition_by=models.F("author_id"),
+                    order_by=models.F("id").asc(),
                 )
+            ).filter(author_rank__lte=books_limit)
 
-        return queryset.distinct().annotate(
-            book_count=models.Count("books", distinct=True)
-        )
+        return queryset.prefetch_related(
+            models.Prefetch(
+                "books",
+                queryset=books.select_related("category", "library").order_by("id"),
+            )
+        ).annotate(book_count=cls._book_count(libraries, categories))
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            GinIndex(
+                fields=["name"], name="author_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+            # Max("updated_at") of the conditional GET validators
+            models.Index(fields=["updated_at"], name="author_updated_at_idx"),
+        ]
+
 
 class Category(models.Model):
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -90,3 +363,160 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ["name"]
+        indexes = [
+            GinIndex(
+                fields=["name"], name="category_name_trgm", opclasses=["gin_trgm_ops"]
+            ),
+            # Max("updated_at") of the conditional GET validators
+            models.Index(fields=["updated_at"], name="category_updated_at_idx"),
+        ]
+
+
+class BookCountRollupQuerySet(models.QuerySet):
+    """Per-(author, ``dimension``) book counts maintained alongside Book."""
+
+    def _columns(self):
+        meta = self.model._meta
+        return meta.db_table, meta.get_field(self.model.dimension).column
+
+    def sum_for_author(self, **filters):
+        """Subquery expression summing an outer author's counts."""
+        return Coalesce(
+            models.Subquery(
+                self.filter(author=models.OuterRef("pk"), **filters)
+                .order_by()
+                .values("author")
+                .annotate(total=models.Sum("book_count"))
+                .values("total")
+            ),
+            0,
+        )
+
+    def apply_deltas(self, deltas):
+        """Add ``{(author_id, dimension_id): change}`` to the stored counts."""
+        table, dimension = self._columns()
+        increments = sorted(
+            (author_id, dimension_id, n)
+            for (author_id, dimension_id), n in deltas.items()
+            if n > 0
+        )
+        decrements = sorted(
+            (author_id, dimension_id, n)
+            for (author_id, dimension_id), n in deltas.items()
+            if n < 0
+        )
+        with connections[self.db].cursor() as cursor:
+            if increments:
+                values = ", ".join(["(%s, %s, %s)"] * len(increments))
+                cursor.execute(
+                    f"INSERT INTO {table} (author_id, {dimension}, book_count)"
+                    f" VALUES {values}"
+                    f" ON CONFLICT (author_id, {dimension})"
+                    f" DO UPDATE SET book_count = {table}.book_count"
+                    f" + EXCLUDED.book_count",
+                    [param for row in increments for param in row],
+                )
+            if decrements:
+                # never insert on the way down: during a cascading delete the
+                # rollup row may already be gone together with its parent
+                values = ", ".join(["(%s, %s, %s)"] * len(decrements))
+                cursor.execute(
+                    f"UPDATE {table} AS t"
+                    f" SET book_count = GREATEST(t.book_count + v.delta, 0)"
+                    f" FROM (VALUES {values}) AS v(author_id, dimension_id, delta)"
+                    f" WHERE t.author_id = v.author_id"
+                    f" AND t.{dimension} = v.dimension_id",
+                    [param for row in decrements for param in row],
+                )
+
+    def rebuild(self, author_ids=None):
+        """Recompute the counts of the given authors (all when None) from Book."""
+        table, dimension = self._columns()
+        book_table = Book._meta.db_table
+        scope, params = "", []
+        if author_ids is not None:
+            scope, params = " AND author_id = ANY(%s)", [list(author_ids)]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE TRUE{scope}", params)
+            cursor.execute(
+                f"INSERT INTO {table} (author_id, {dimension}, book_count)"
+                f" SELECT author_id, {dimension}, count(*) FROM {book_table}"
+                f" WHERE {dimension} IS NOT NULL{scope}"
+                f" GROUP BY author_id, {dimension}",
+                params,
+            )
+
+    def drift(self):
+        """Number of (author, dimension) pairs whose stored count is wrong."""
+        table, dimension = self._columns()
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {table} AS stored FULL OUTER JOIN ("
+                f" SELECT author_id, {dimension}, count(*) AS book_count"
+                f" FROM {Book._meta.db_table} WHERE {dimension} IS NOT NULL"
+                f" GROUP BY author_id, {dimension}"
+                f") AS actual USING (author_id, {dimension})"
+                f" WHERE coalesce(stored.book_count, 0)"
+                f" <> coalesce(actual.book_count, 0)"
+            )
+            return cursor.fetchone()[0]
+
+
+class AuthorLibraryBookCount(models.Model):
+    dimension = "library"
+
+    author = models.ForeignKey(
+        Author, on_delete=models.CASCADE, related_name="library_book_counts"
+    )
+    library = models.ForeignKey(
+        Library, on_delete=models.CASCADE, related_name="author_book_counts"
+    )
+    book_count = models.PositiveIntegerField(default=0)
+
+    objects = BookCountRollupQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("author", "library")
+
+
+class AuthorCategoryBookCount(models.Model):
+    dimension = "category"
+
+    author = models.ForeignKey(
+        Author, on_delete=models.CASCADE, related_name="category_book_counts"
+    )
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, related_name="author_book_counts"
+    )
+    book_count = models.PositiveIntegerField(default=0)
+
+    objects = BookCountRollupQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("author", "category")
+
+
+def apply_book_count_deltas(deltas, using="default"):
+    """Apply ``{(author_id, library_id, category_id): change}`` to every counter."""
+    totals, per_library, per_category = Counter(), Counter(), Counter()
+    for (author_id, library_id, category_id), n in deltas.items():
+        if not n:
+            continue
+        totals[author_id] += n
+        per_library[(author_id, library_id)] += n
+        if category_id is not None:
+            per_category[(author_id, category_id)] += n
+    Author.objects.using(using).apply_book_count_deltas(totals)
+    AuthorLibraryBookCount.objects.using(using).apply_deltas(per_library)
+    AuthorCategoryBookCount.objects.using(using).apply_deltas(per_category)
+
+
+def refresh_book_counts(author_ids=None, using="default"):
+    """Recompute every counter of the given authors (all when None) from Book."""
+    authors = Author.objects.using(using)
+    if author_ids is not None:
+        author_ids = list(author_ids)
+        authors = authors.filter(pk__in=author_ids)
+    authors.rebuild_book_counts()
+    AuthorLibraryBookCount.objects.using(using).rebuild(author_ids)
+    AuthorCategoryBookCount.objects.using(using).rebuild(author_ids)
@@ -0,0 +1,74 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page-number pagination unless the client opts into keyset pagination
+    with ``?pagination=cursor``.
+
+    Cursor pages seek on the view's ``cursor_ordering`` instead of running a
+    COUNT(*) and an OFFSET scan, so deep pages cost the same as the first one.
+    The ordering must be unique and backed by an index.
+
+    DRF's cursor only encodes the first ordering field: later fields break
+    ties in the ORDER BY, and rows sharing the first value are skipped with
+    an OFFSET. A trailing ``id`` keeps pages stable, but the seek is only as
+    selective as the leading field, so it should rarely repeat.
+
+    Query parameters that impose their own ordering (a view's
+    ``cursor_incompatible_params``) are rejected in cursor mode, since the
+    cursor would silently replace that ordering with ``cursor_ordering``.
+    """
+
+    mode_query_param = "pagination"
+    cursor_ordering = ("id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            for param in getattr(view, "cursor_incompatible_params", ()):
+                if request.query_params.get(param, "").strip():
+                    raise ValidationError(
+                        {param: "Cannot be combined with cursor pagination."}
+                    )
+            self.cursor_paginator = CursorPagination()
+            self.cursor_paginator.page_size = self.page_size
+            self.cursor_paginator.ordering = getattr(
+                view, "cursor_ordering", self.cursor_ordering
+            )
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or CursorPagination.cursor_query_param in request.query_params
+        )
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters.append(
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to 'cursor' for keyset pagination.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            }
+        )
+        parameters.append(
+            {
+                "name": CursorPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": CursorPagination.cursor_query_description,
+                "schema": {"type": "string"},
+            }
+        )
+        return parameters
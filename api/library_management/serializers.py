@@ -1,4 +1,5 @@
 from .models import Book, Author, Category, Library
+from .eager_loading import EagerLoadingMixin
 from rest_framework import serializers
 
 
@@ -16,18 +17,68 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "name"]
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField()
     category = serializers.StringRelatedField()
     library_name = serializers.StringRelatedField(source="library", read_only=True)
 
     class Meta:
         model = Book
-        fields = "__all__"
+        exclude = ["search_vector"]
         read_only_fields = ["id", "created_at", "updated_at"]
+        select_related = ["author", "category", "library"]
+        fast_values = {
+            "author": "author__name",
+            "category": "category__name",
+            "library_name": "library__name",
+        }
 
 
-class AuthorWithBooksSerializer(serializers.ModelSerializer):
+class BookAvailabilityInputSerializer(serializers.Serializer):
+    MAX_ISBNS = 100
+
+    isbns = serializers.ListField(
+        child=serializers.CharField(max_length=13),
+        allow_empty=False,
+        max_length=MAX_ISBNS,
+    )
+    libraries = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, allow_empty=False
+    )
+
+
+class NearestLibrariesInputSerializer(serializers.Serializer):
+    MAX_LIMIT = 50
+
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_LIMIT, default=10)
+
+
+class NearestAvailableInputSerializer(NearestLibrariesInputSerializer):
+    isbn = serializers.CharField(max_length=13, required=False)
+    # BigAutoField range, so the lookup cannot overflow
+    book = serializers.IntegerField(min_value=1, max_value=2**63 - 1, required=False)
+    radius = serializers.FloatField(required=False)
+
+    def validate_radius(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Must be a positive number of km.")
+        return value
+
+    def validate(self, attrs):
+        if "isbn" not in attrs and "book" not in attrs:
+            raise serializers.ValidationError({"isbn": "Pass an isbn or a book id."})
+        return attrs
+
+
+class AuthorsWithBooksInputSerializer(serializers.Serializer):
+    MAX_BOOKS_LIMIT = 1000
+
+    books_limit = serializers.IntegerField(
+        min_value=1, max_value=MAX_BOOKS_LIMIT, required=False
+    )
+
+
+class AuthorWithBooksSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     books = BookSerializer(many=True, read_only=True)
     book_count = serializers.IntegerField(read_only=True)
 
@@ -42,3 +93,11 @@ class LibrarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Library
         fields = ["id", "name", "address", "phone_number", "location", "distance"]
+
+
+class AvailableCopyLibrarySerializer(LibrarySerializer):
+    book_id = serializers.IntegerField(read_only=True)
+    available_copies = serializers.IntegerField(read_only=True)
+
+    class Meta(LibrarySerializer.Meta):
+        fields = LibrarySerializer.Meta.fields + ["book_id", "available_copies"]
@@ -0,0 +1,75 @@
+from collections import Counter
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .caching import bump_generations_on_commit, scope_for
+from .models import (
+    Book,
+    Author,
+    Category,
+    Library,
+    SEARCH_VECTOR_SOURCE_FIELDS,
+    apply_book_count_deltas,
+)
+
+
+@receiver(post_save, sender=Book)
+def refresh_book_search_vector(sender, instance, raw=False, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if raw:
+        return
+    if update_fields and not SEARCH_VECTOR_SOURCE_FIELDS & update_fields:
+        return
+    Book.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+def refresh_related_books_search_vector(sender, instance, created, raw=False, **kwargs):
+    # a new author/category has no books yet
+    if raw or created:
+        return
+    # the name is rendered with every book, so this also touches updated_at
+    instance.books.all().update(
+        search_vector=Book.search_vector_expression(), updated_at=Now()
+    )
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_books(sender, instance, using, **kwargs):
+    # Book.category is SET_NULL, which the collector runs as a raw UPDATE
+    # before post_delete, so the books cannot be found by category afterwards
+    instance._book_ids = list(instance.books.using(using).values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def refresh_uncategorized_books_search_vector(sender, instance, using, **kwargs):
+    book_ids = getattr(instance, "_book_ids", None)
+    if not book_ids:
+        return
+    # drop the deleted name from their vectors, and from their cached renders
+    Book.objects.using(using).filter(pk__in=book_ids).update(
+        search_vector=Book.search_vector_expression(), updated_at=Now()
+    )
+
+
+@receiver(post_delete, sender=Book)
+def decrement_book_counts(sender, instance, using, **kwargs):
+    # sent inside the deleting transaction, also for cascades and queryset.delete()
+    key = getattr(instance, "_loaded_counter_key", None) or instance.counter_key
+    apply_book_count_deltas(Counter({key: -1}), using=using)
+
+
+@receiver(post_save, sender=Library)
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender="users.UserLocation")
+@receiver(post_delete, sender=Library)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender="users.UserLocation")
+def invalidate_cached_responses(sender, **kwargs):
+    # covers the API, the admin and anything else going through the ORM
+    bump_generations_on_commit(scope_for(sender))
@@ -0,0 +1,25 @@
+"""
+Spatial expressions PostGIS can answer from the GiST index on a geography
+column.
+"""
+
+from django.contrib.gis.db.models import PointField
+from django.db.models import FloatField, Func, Value
+
+
+class KNNDistance(Func):
+    """
+    ``column <-> point``: the index-assisted nearest-neighbour distance.
+
+    Meant for ``order_by`` with a LIMIT. On geography it is the spherical
+    distance, so annotate ``Distance`` as well when exact meters are shown.
+    """
+
+    arg_joiner = " <-> "
+    template = "%(expressions)s"
+    output_field = FloatField()
+
+    def __init__(self, expression, point, **extra):
+        super().__init__(
+            expression, Value(point, output_field=PointField(geography=True)), **extra
+        )
@@ -0,0 +1,119 @@
+"""
+Synthetic catalog generation for the benchmark commands.
+
+Rows are produced server side with ``generate_series`` so that millions of
+books can be seeded in seconds. Never point these helpers at production.
+"""
+
+import csv
+import hashlib
+import json
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+
+from .catalog_import import CATALOG_COLUMNS
+from .models import Author, Book, Category, Library, refresh_book_counts
+
+WORLD = (-180, -80, 180, 80)
+
+
+def seed_libraries(libraries, bbox=WORLD):
+    """Insert libraries at random points of a (lon, lat, lon, lat) bbox."""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {Library._meta.db_table}
+                (name, address, phone_number, location, updated_at)
+            SELECT 'Library ' || md5('library' || g), g || ' Synthetic Street',
+                   lpad(g::text, 10, '0'),
+                   ST_SetSRID(ST_MakePoint(%s + random() * %s,
+                                           %s + random() * %s), 4326)::geography,
+                   now()
+            FROM generate_series(1, %s) g
+            """,
+            [min_lon, max_lon - min_lon, min_lat, max_lat - min_lat, libraries],
+        )
+        cursor.execute(f"ANALYZE {Library._meta.db_table}")
+
+
+@transaction.atomic
+def seed_catalog(books, authors=50_000, libraries=500, categories=200):
+    """Insert synthetic libraries, authors, categories and books."""
+    library_table = Library._meta.db_table
+    author_table = Author._meta.db_table
+    category_table = Category._meta.db_table
+    book_table = Book._meta.db_table
+
+    seed_libraries(libraries)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {author_table} (name, total_books, updated_at)
+            SELECT 'Author ' || md5('author' || g), 0, now()
+            FROM generate_series(1, %s) g
+            """,
+            [authors],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {category_table} (name, updated_at)
+            SELECT 'Category ' || md5('category' || g), now()
+            FROM generate_series(1, %s) g
+            """,
+            [categories],
+        )
+        cursor.execute(
+            f"""
+            WITH a AS (SELECT array_agg(id) AS ids FROM {author_table}),
+                 l AS (SELECT array_agg(id) AS ids FROM {library_table}),
+                 c AS (SELECT array_agg(id) AS ids FROM {category_table}),
+                 offset_ AS (SELECT coalesce(max(id), 0) AS n FROM {book_table})
+            INSERT INTO {book_table}
+                (title, author_id, library_id, category_id, published_date,
+                 available_copies, isbn, updated_at)
+            SELECT 'Title ' || md5('book' || g),
+                   a.ids[1 + g %% cardinality(a.ids)],
+                   l.ids[1 + g %% cardinality(l.ids)],
+                   c.ids[1 + g %% cardinality(c.ids)],
+                   date '1950-01-01' + (g %% 25000),
+                   g %% 5,
+                   lpad((offset_.n + g)::text, 13, '0'),
+                   now()
+            FROM generate_series(1, %s) g, a, l, c, offset_
+            """,
+            [books],
+        )
+        refresh_book_counts()
+        for table in (library_table, author_table, category_table, book_table):
+            cursor.execute(f"ANALYZE {table}")
+
+
+def _name(label, seed):
+    # same names as seed_catalog, so files and seeded tables line up
+    return f"{label} " + hashlib.md5(seed.encode()).hexdigest()
+
+
+def write_catalog_file(
+    path, books, authors=50_000, libraries=500, categories=200, file_format="csv"
+):
+    """Write a synthetic catalog file in the ``import_catalog`` format."""
+    with open(path, "w", encoding="utf-8", newline="") as stream:
+        writer = csv.writer(stream)
+        if file_format == "csv":
+            writer.writerow(CATALOG_COLUMNS)
+        for g in range(1, books + 1):
+            row = (
+                str(g).zfill(13),
+                _name("Title", f"book{g}"),
+                _name("Author", f"author{1 + g % authors}"),
+                _name("Category", f"category{1 + g % categories}"),
+                _name("Library", f"library{1 + g % libraries}"),
+                (date(1950, 1, 1) + timedelta(days=g % 25000)).isoformat(),
+                g % 5,
+            )
+            if file_format == "csv":
+                writer.writerow(row)
+            else:
+                stream.write(json.dumps(dict(zip(CATALOG_COLUMNS, row))) + "\n")
@@ -1,43 +1,189 @@
 from rest_framework import viewsets
 from rest_framework.permissions import (
+    IsAuthenticated,
     IsAuthenticatedOrReadOnly,
     AllowAny,
 )
+from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from .serializers import (
     BookSerializer,
     AuthorSerializer,
     CategorySerializer,
     LibrarySerializer,
     AuthorWithBooksSerializer,
+    AuthorsWithBooksInputSerializer,
+    AvailableCopyLibrarySerializer,
+    BookAvailabilityInputSerializer,
+    NearestAvailableInputSerializer,
+    NearestLibrariesInputSerializer,
 )
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import BookFilter, LibraryFilter, AuthorFilter
 from .models import Book, Author, Category, Library
+from .pagination import OptionalCursorPagination
+from .eager_loading import EagerLoadingViewSetMixin
+from .caching import BOOK_AVAILABILITY, CachedReadMixin, cached_response, scope_for
+from .conditional import ConditionalGetMixin, conditional_get
+from .fast_serialization import FastListMixin
+from .exports import EXPORT_RENDERERS, ExportMixin
+from django.db.models import F
+from django.shortcuts import get_object_or_404
+from api.users.models import UserLocation
 
+LIBRARY = scope_for(Library)
+BOOK = scope_for(Book)
+AUTHOR = scope_for(Author)
+CATEGORY = scope_for(Category)
 
-class LibraryViewSet(viewsets.ModelViewSet):
+
+class LibraryViewSet(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    EagerLoadingViewSetMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Library.objects.all()
     serializer_class = LibrarySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = LibraryFilter
     filterset_fields = ["category", "author"]
+    cache_scopes = (LIBRARY, BOOK, AUTHOR, CATEGORY, "users.userlocation")
+    cache_vary_on_user = ("radius",)
+
+    def get_validator_querysets(self):
+        querysets = super().get_validator_querysets()
+        params = self.request.query_params
+        if "category" in params or "author" in params:
+            querysets.append(Book.objects.all())
+        if "radius" in params and self.request.user.is_authenticated:
+            querysets.append(
+                UserLocation.objects.filter(user=self.request.user).alias(
+                    updated_at=F("last_updated")
+                )
+            )
+        return querysets
+
+    @action(detail=False, methods=["GET"], permission_classes=[IsAuthenticated])
+    def nearest(self, request):
+        """The ``limit`` libraries nearest to the user's location."""
+        serializer = NearestLibrariesInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        user_location = UserLocation.objects.filter(user=request.user).first()
+        if user_location is None or user_location.location is None:
+            raise ValidationError({"location": "Set your location first."})
+        libraries = user_location.get_nearest_libraries(
+            serializer.validated_data["limit"]
+        )
+        return Response(LibrarySerializer(libraries, many=True).data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="nearest-available",
+        permission_classes=[IsAuthenticated],
+    )
+    def nearest_available(self, request):
+        """Nearest libraries with a copy of ``isbn`` (or ``book``) on the shelf."""
+        serializer = NearestAvailableInputSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if "isbn" in params:
+            isbn = params["isbn"]
+        else:
+            isbn = get_object_or_404(Book, pk=params["book"]).isbn
+
+        user_location = UserLocation.objects.filter(user=request.user).first()
+        if user_location is None or user_location.location is None:
+            raise ValidationError({"location": "Set your location first."})
+
+        libraries = Library.objects.with_available_copy(isbn)
+        if "radius" in params:
+            libraries = libraries.within_radius(
+                user_location.location, params["radius"]
+            )
+        else:
+            libraries = libraries.nearest(user_location.location)
+        serializer = AvailableCopyLibrarySerializer(
+            libraries[: params["limit"]], many=True
+        )
+        return Response(serializer.data)
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    FastListMixin,
+    ExportMixin,
+    EagerLoadingViewSetMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = BookFilter
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ("id",)
+    # q orders by search rank, which the id cursor cannot seek on
+    cursor_incompatible_params = ("q",)
+    cache_scopes = (BOOK, BOOK_AVAILABILITY, AUTHOR, CATEGORY, LIBRARY)
 
+    def get_validator_querysets(self):
+        # author and category renames touch their books, library renames don't
+        return [*super().get_validator_querysets(), Library.objects.all()]
 
-class AuthorViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=["POST"], permission_classes=[AllowAny])
+    def availability(self, request):
+        """
+        ``available_copies`` per library for each requested ISBN, as
+        ``{isbn: {library_id: copies}}``; unknown ISBNs map to ``{}``.
+        """
+        serializer = BookAvailabilityInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        isbns = serializer.validated_data["isbns"]
+        # one lookup on the (isbn, library) unique index
+        books = Book.objects.filter(isbn__in=set(isbns))
+        if "libraries" in serializer.validated_data:
+            books = books.filter(library__in=serializer.validated_data["libraries"])
+        availability = {isbn: {} for isbn in isbns}
+        for isbn, library_id, copies in books.values_list(
+            "isbn", "library_id", "available_copies"
+        ):
+            availability[isbn][str(library_id)] = copies
+        return Response(availability)
+
+    @action(detail=False, methods=["GET"], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        # same filters as the list, without pagination
+        return self.export_response(self.filter_queryset(self.get_queryset()), "books")
+
+
+class AuthorViewSet(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    FastListMixin,
+    EagerLoadingViewSetMixin,
+    viewsets.ModelViewSet,
+):
     serializer_class = AuthorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_class = AuthorFilter
+    pagination_class = OptionalCursorPagination
+    cursor_ordering = ("id",)
+    cache_scopes = (AUTHOR, BOOK, LIBRARY, CATEGORY)
+
+    def get_cache_scopes(self):
+        if self.action == "with_books":
+            return (*self.cache_scopes, BOOK_AVAILABILITY)
+        return self.cache_scopes
+
+    def get_validator_querysets(self):
+        # book counts and nested books follow every book write
+        return [Author.objects.all(), Book.objects.all(), Library.objects.all()]
 
     def get_queryset(self):
         filters = {}
@@ -45,23 +191,35 @@ class AuthorViewSet(viewsets.ModelViewSet):
             filters["library"] = self.request.query_params["library"]
         if "category" in self.request.query_params:
             filters["category"] = self.request.query_params["category"]
-        return Author.get_filtered_authors(filters)
+        return self.with_eager_loading(Author.get_filtered_authors(filters))
 
     @action(detail=False, methods=["GET"])
+    @conditional_get
+    @cached_response
     def with_books(self, request):
         filters = {}
         for param in ["library", "category"]:
             if param in request.query_params:
                 filters[param] = request.query_params[param]
+        params = AuthorsWithBooksInputSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        books_limit = params.validated_data.get("books_limit")
         # get query
-        fetched_query = Author.get_authors_with_books(filters)
+        fetched_query = self.with_eager_loading(
+            Author.get_authors_with_books(filters, books_limit=books_limit),
+            AuthorWithBooksSerializer,
+        )
         # pagination
-        page = self.paginate_queryset(fetched_query)
-        serializer = AuthorWithBooksSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        return self.list_response(fetched_query, AuthorWithBooksSerializer)
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(
+    ConditionalGetMixin,
+    CachedReadMixin,
+    EagerLoadingViewSetMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    cache_scopes = (CATEGORY,)
@@ -1,6 +1,69 @@
+from django import forms
 from django.contrib import admin
 
 # Register your models here.
-from .models import BorrowingRecord
+from .models import (
+    ActiveBorrowingCount,
+    BorrowingRecord,
+    BorrowingRequest,
+    OutboxEvent,
+)
 
-admin.site.register(BorrowingRecord)
+
+class BorrowingRecordAdminForm(forms.ModelForm):
+    class Meta:
+        model = BorrowingRecord
+        fields = "__all__"
+
+    def clean(self):
+        # the pre_save signal enforces the limit too, but only as an error page
+        cleaned_data = super().clean()
+        user = cleaned_data.get("user")
+        if user is None or cleaned_data.get("returned_at") is not None:
+            return cleaned_data
+        record = self.instance
+        if (
+            not record._state.adding
+            and record.returned_at is None
+            and record.user_id == user.pk
+        ):
+            # already holds its slot
+            return cleaned_data
+        active = (
+            ActiveBorrowingCount.objects.filter(user=user)
+            .values_list("active", flat=True)
+            .first()
+            or 0
+        )
+        if active >= BorrowingRecord.MAX_BOOKS_PER_USER:
+            raise forms.ValidationError(
+                f"{user} already has {active} active borrowings, the limit is "
+                f"{BorrowingRecord.MAX_BOOKS_PER_USER}."
+            )
+        return cleaned_data
+
+
+@admin.register(BorrowingRecord)
+class BorrowingRecordAdmin(admin.ModelAdmin):
+    form = BorrowingRecordAdminForm
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "kind",
+        "user",
+        "created_at",
+        "dispatched_at",
+        "attempts",
+        "next_attempt_at",
+    )
+    list_filter = ("kind",)
+    search_fields = ("dedupe_key",)
+
+
+@admin.register(BorrowingRequest)
+class BorrowingRequestAdmin(admin.ModelAdmin):
+    list_display = ("id", "user", "status", "created_at", "processed_at")
+    list_filter = ("status",)
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class RecordsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api.records"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .services import BORROWING_ENGINES
+
+        if settings.BORROWING_ENGINE not in BORROWING_ENGINES:
+            raise ImproperlyConfigured(
+                f"BORROWING_ENGINE must be one of {', '.join(BORROWING_ENGINES)}, "
+                f"not {settings.BORROWING_ENGINE!r}."
+            )
@@ -0,0 +1,178 @@
+"""
+Queued borrowing mode (``BORROWING_MODE = "queued"``).
+
+When a popular title drops, the synchronous path has every request open its
+own transaction and queue on the same Book row lock. In the queued mode a
+request only inserts a ``BorrowingRequest`` and answers 202; ``drain`` then
+allocates the pending requests in micro-batches, strictly in arrival order,
+and commits each batch at once (group commit): the hot rows are locked once
+per batch instead of once per request.
+
+A single drainer runs at a time (a transaction-level advisory lock), which
+is what makes the allocation first-come, first-served across batches. A
+drainer that cannot take the lock leaves at once, so the one holding it
+looks for pending requests again after committing a short batch: anything
+whose own drainer gave up was committed before that commit. Each
+request succeeds or fails as a whole, with the same messages as the
+synchronous path; clients poll ``/borrowings/requests/<id>/`` and are
+emailed the usual confirmation through the outbox.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.library_management.caching import (
+    BOOK_AVAILABILITY,
+    bump_generations_on_commit,
+)
+from api.library_management.models import Book
+from .models import ActiveBorrowingCount, BorrowingRecord, BorrowingRequest
+from .outbox import enqueue_borrowing_confirmations
+from .services import BorrowingService
+
+# pg_advisory_xact_lock key of the drainer
+DRAIN_LOCK = 0x626F72726F77  # "borrow"
+
+
+def enqueue(user, book_ids, due_date):
+    """Accept a bulk borrow for later allocation; returns the request."""
+    BorrowingService._validate_due_date(due_date)
+    request = BorrowingRequest.objects.create(
+        user=user,
+        book_ids=list(dict.fromkeys(getattr(book, "pk", book) for book in book_ids)),
+        due_date=due_date,
+    )
+    from .tasks import process_borrowing_queue
+
+    transaction.on_commit(process_borrowing_queue.delay)
+    return request
+
+
+def drain(batch_size=None):
+    """Allocate pending requests until none are left; returns how many were."""
+    batch_size = batch_size or settings.BORROWING_QUEUE_BATCH_SIZE
+    processed = 0
+    while True:
+        allocated = _allocate_batch(batch_size)
+        if allocated is None:
+            # another drainer holds the queue and will empty it
+            return processed
+        processed += allocated
+        if allocated < batch_size and not _has_pending():
+            return processed
+
+
+def _has_pending():
+    return BorrowingRequest.objects.filter(status=BorrowingRequest.PENDING).exists()
+
+
+@transaction.atomic
+def _allocate_batch(batch_size):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [DRAIN_LOCK])
+        if not cursor.fetchone()[0]:
+            return None
+    requests = list(
+        BorrowingRequest.objects.filter(status=BorrowingRequest.PENDING).order_by("id")[
+            :batch_size
+        ]
+    )
+    if not requests:
+        return 0
+
+    # the lock order of BorrowingService: counters, then books, by id
+    active = ActiveBorrowingCount.objects.lock(
+        sorted({request.user_id for request in requests})
+    )
+    books = {
+        book_id: [copies, title]
+        for book_id, copies, title in Book.objects.select_for_update()
+        .filter(id__in={pk for request in requests for pk in request.book_ids})
+        .order_by("id")
+        .values_list("id", "available_copies", "title")
+    }
+
+    now = timezone.now()
+    accepted, records = [], []
+    for request in requests:
+        request.processed_at = now
+        error = _allocation_error(request, active, books)
+        if error:
+            request.status = BorrowingRequest.REJECTED
+            request.error = error
+            continue
+        for book_id in request.book_ids:
+            books[book_id][0] -= 1
+            records.append(
+                BorrowingRecord(
+                    book_id=book_id, user_id=request.user_id, due_date=request.due_date
+                )
+            )
+        active[request.user_id] += len(request.book_ids)
+        request.status = BorrowingRequest.COMPLETED
+        accepted.append(request)
+
+    created = iter(BorrowingRecord.objects.bulk_create(records))
+    borrows = []
+    for request in accepted:
+        request_records = [next(created) for _ in request.book_ids]
+        request.record_ids = [record.id for record in request_records]
+        borrows.append((request.user_id, request_records))
+    _take_copies(Counter(record.book_id for record in records))
+    ActiveBorrowingCount.objects.take(_borrowed_per_user(accepted))
+    BorrowingRequest.objects.bulk_update(
+        requests, ["status", "error", "record_ids", "processed_at"]
+    )
+    enqueue_borrowing_confirmations(borrows)
+    if records:
+        bump_generations_on_commit(BOOK_AVAILABILITY)
+    return len(requests)
+
+
+def _borrowed_per_user(requests):
+    borrowed = Counter()
+    for request in requests:
+        borrowed[request.user_id] += len(request.book_ids)
+    return borrowed
+
+
+def _allocation_error(request, active, books):
+    """Why ``request`` cannot be granted from what is left, or None."""
+    try:
+        BorrowingService._validate_due_date(request.due_date)
+    except ValidationError as e:
+        return e.messages[0]
+    wanted = len(request.book_ids)
+    allowed = BorrowingRecord.MAX_BOOKS_PER_USER - active[request.user_id]
+    if wanted > allowed:
+        return (
+            f"Cannot borrow {wanted} more books. "
+            f"You have {active[request.user_id]} active borrowings. "
+            f"You can borrow {max(0, allowed)} more."
+        )
+    missing_ids = set(request.book_ids) - set(books)
+    if missing_ids:
+        return f"One or more requested books do not exist. Missing IDs: {missing_ids}"
+    for book_id in request.book_ids:
+        copies, title = books[book_id]
+        if copies < 1:
+            return f"Book '{title}' (ID: {book_id}) is not available."
+    return None
+
+
+def _take_copies(taken):
+    """Decrement ``{book_id: copies}`` in one statement."""
+    if not taken:
+        return
+    values = ", ".join(["(%s, %s)"] * len(taken))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Book._meta.db_table} AS b"
+            f" SET available_copies = b.available_copies - v.n, updated_at = now()"
+            f" FROM (VALUES {values}) AS v(id, n) WHERE b.id = v.id",
+            [param for row in sorted(taken.items()) for param in row],
+        )
@@ -1,6 +1,6 @@
 # records/management/commands/setup_periodic_tasks.py
 from django.core.management.base import BaseCommand
-from django_celery_beat.models import PeriodicTask, CrontabSchedule
+from django_celery_beat.models import PeriodicTask, CrontabSchedule, IntervalSchedule
 
 
 class Command(BaseCommand):
@@ -17,6 +17,27 @@ class Command(BaseCommand):
         PeriodicTask.objects.get_or_create(
             crontab=schedule,
             name="Send borrowing reminders daily",
-            task="records.tasks.send_borrowing_reminders",
+            task="api.records.tasks.send_borrowing_reminders",
+        )
+        PeriodicTask.objects.get_or_create(
+            crontab=schedule,
+            name="Create upcoming borrowing partitions daily",
+            task="api.records.tasks.maintain_borrowing_partitions",
+        )
+        # borrowing confirmations are dispatched on commit; this catches
+        # whatever a lost wake-up or a failed send left behind
+        every_minute, _ = IntervalSchedule.objects.get_or_create(
+            every=1, period=IntervalSchedule.MINUTES
+        )
+        PeriodicTask.objects.get_or_create(
+            interval=every_minute,
+            name="Dispatch pending outbox events",
+            task="api.records.tasks.dispatch_outbox",
+        )
+        # queued borrows wake the worker on commit; this is the safety net
+        PeriodicTask.objects.get_or_create(
+            interval=every_minute,
+            name="Process queued borrowing requests",
+            task="api.records.tasks.process_borrowing_queue",
         )
         self.stdout.write(self.style.SUCCESS("Periodic tasks set up successfully."))
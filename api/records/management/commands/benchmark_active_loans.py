@@ -0,0 +1,99 @@
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from api.library_management.models import Book
+from api.library_management.synthetic import seed_catalog
+from api.records.models import BorrowingRecord
+from api.records.partitions import MONTHS_AHEAD, create_partitions, month_partitions
+from api.records.synthetic import seed_borrowings
+
+
+class Command(BaseCommand):
+    help = (
+        "Grow the returned-loan history step by step and time the open-loan "
+        "queries after each step. With BorrowingRecord partitioned on "
+        "returned_at they only touch the open partition, so their latency "
+        "should stay flat. The user history cannot be pruned and grows with "
+        "the number of month partitions, which each step can add to with "
+        "--months-per-step. Inserts synthetic data; use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--open", type=int, default=100_000, help="Open loans, seeded once"
+        )
+        parser.add_argument(
+            "--steps",
+            nargs="+",
+            type=int,
+            default=[1_000_000, 4_000_000, 5_000_000],
+            help="Returned loans added before each measurement",
+        )
+        parser.add_argument(
+            "--months-per-step",
+            type=int,
+            default=0,
+            help="Empty month partitions created ahead of time before each step",
+        )
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--seed-books", type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        if not Book.objects.exists():
+            seed_catalog(books=options["seed_books"])
+        seed_borrowings(options["open"], users=options["open"] // 2, open_percent=100)
+        users = list(
+            BorrowingRecord.objects.filter(returned_at__isnull=True)
+            .values_list("user_id", flat=True)
+            .distinct()[: options["repeat"]]
+        )
+        if not users:
+            raise CommandError("No open loans were seeded.")
+
+        self.stdout.write(
+            f"{'history':>12}  {'partitions':>10}  "
+            + "  ".join(f"{l:>14}" for l in self.labels())
+        )
+        self.measure(users, options["repeat"])
+        months_ahead = MONTHS_AHEAD
+        for returned in options["steps"]:
+            months_ahead += options["months_per_step"]
+            create_partitions(months_ahead=months_ahead)
+            seed_borrowings(returned, users=10_000, open_percent=0)
+            self.measure(users, options["repeat"])
+
+    def labels(self):
+        return ["user open", "user history", "due soon", "overdue"]
+
+    def queries(self, user_id):
+        today = date.today()
+        open_records = BorrowingRecord.objects.filter(returned_at__isnull=True)
+        return [
+            # the borrowing limit and the return ownership check
+            lambda: open_records.filter(user_id=user_id).count(),
+            # BorrowingRecordViewSet's first page
+            lambda: list(
+                BorrowingRecord.objects.filter(user_id=user_id).order_by(
+                    "-borrowed_at", "-id"
+                )[:20]
+            ),
+            # the reminder window
+            lambda: open_records.filter(
+                due_date__gte=today, due_date__lte=today + timedelta(days=3)
+            ).count(),
+            lambda: open_records.filter(due_date__lt=today).count(),
+        ]
+
+    def measure(self, users, repeat):
+        timings = [[] for _ in self.labels()]
+        for n in range(repeat):
+            for timing, query in zip(timings, self.queries(users[n % len(users)])):
+                started = time.perf_counter()
+                query()
+                timing.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"{BorrowingRecord.objects.count():>12}  "
+            f"{len(month_partitions()):>10}  "
+            + "  ".join(f"{statistics.median(t):>11.2f} ms" for t in timings)
+        )
@@ -0,0 +1,125 @@
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from api.library_management.models import Author, Book, Library
+from api.records.models import BorrowingRecord
+from api.records.services import BorrowingService
+
+USERNAME_PREFIX = "borrow-benchmark-"
+
+
+class LockWaitSampler(threading.Thread):
+    """Integrates the number of backends waiting on a lock over time."""
+
+    interval = 0.01
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.stopped = threading.Event()
+        self.waiting_seconds = 0.0
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity"
+                        " WHERE wait_event_type = 'Lock'"
+                        " AND datname = current_database()"
+                    )
+                    self.waiting_seconds += cursor.fetchone()[0] * self.interval
+                    time.sleep(self.interval)
+        finally:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Many threads borrowing the same hot book: compare throughput and lock "
+        "wait time of the locking and conditional borrowing engines. Creates "
+        "and removes its own users and book; run against a scratch database "
+        "with DJANGO_ENV other than development (no confirmation emails)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--borrows", type=int, default=50, help="Per thread")
+        parser.add_argument("--engines", nargs="+", default=["locking", "conditional"])
+
+    def handle(self, *args, **options):
+        threads, borrows = options["threads"], options["borrows"]
+        users = [
+            User.objects.get_or_create(username=f"{USERNAME_PREFIX}{n}")[0]
+            for n in range(threads)
+        ]
+        library = Library.objects.create(
+            name="Borrow benchmark", address="", phone_number=""
+        )
+        author = Author.objects.create(name="Borrow benchmark")
+        try:
+            for engine in options["engines"]:
+                book = Book.objects.create(
+                    title="Hot title",
+                    author=author,
+                    library=library,
+                    published_date=date(2000, 1, 1),
+                    available_copies=threads * borrows,
+                    isbn=f"bench-{engine}"[:13],
+                )
+                self.run_engine(engine, book, users, borrows)
+        finally:
+            # cascades to the books and their borrowing records
+            library.delete()
+            author.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def run_engine(self, engine, book, users, borrows):
+        due_date = date.today() + timedelta(days=7)
+        latencies, failures = [], []
+        start = threading.Barrier(len(users) + 1)
+
+        def borrower(user):
+            try:
+                start.wait()
+                for _ in range(borrows):
+                    started = time.perf_counter()
+                    try:
+                        records = BorrowingService.borrow_books(
+                            user, [book.id], due_date, engine=engine
+                        )
+                    except ValidationError as error:
+                        failures.append(error)
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    # untimed: keep the user under MAX_BOOKS_PER_USER
+                    BorrowingRecord.objects.filter(pk=records[0].pk).delete()
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=borrower, args=(u,)) for u in users]
+        for worker in workers:
+            worker.start()
+        sampler = LockWaitSampler()
+        sampler.start()
+        start.wait()
+        started = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        sampler.stopped.set()
+        sampler.join()
+
+        book.refresh_from_db()
+        expected = len(users) * borrows - len(latencies)
+        consistent = "ok" if book.available_copies == expected else "MISMATCH"
+        p95 = statistics.quantiles(latencies, n=100)[94] * 1000 if latencies else 0
+        self.stdout.write(
+            f"{engine:<12} {len(latencies) / elapsed:>9.1f} borrows/s "
+            f"p95 {p95:>8.2f} ms  lock wait {sampler.waiting_seconds:>7.2f} s  "
+            f"failed {len(failures)}  copies {consistent}"
+        )
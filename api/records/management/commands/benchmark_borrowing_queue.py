@@ -0,0 +1,130 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.library_management.models import Author, Book, Library
+from api.records import borrowing_queue
+from api.records.models import BorrowingRecord, BorrowingRequest
+
+USERNAME_PREFIX = "queue-benchmark-"
+
+
+def percentile(values, n):
+    return statistics.quantiles(values, n=100)[n - 1] if len(values) > 1 else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a popular release: many users POST /borrowings/ for one hot "
+        "book at once. Compares throughput and p99 latency of the sync mode "
+        "with the queued mode, whose allocation runs here in a drainer thread. "
+        "Needs the Celery broker of the dev setup (the modes wake workers on "
+        "commit); creates and removes its own users and books."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--copies", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=32)
+        parser.add_argument("--modes", nargs="+", default=["sync", "queued"])
+
+    def handle(self, *args, **options):
+        users = User.objects.bulk_create(
+            User(username=f"{USERNAME_PREFIX}{n}", password="!")
+            for n in range(options["users"])
+        )
+        library = Library.objects.create(
+            name="Queue benchmark", address="", phone_number=""
+        )
+        author = Author.objects.create(name="Queue benchmark")
+        try:
+            for mode in options["modes"]:
+                book = Book.objects.create(
+                    title="New release",
+                    author=author,
+                    library=library,
+                    published_date=date(2000, 1, 1),
+                    available_copies=options["copies"],
+                    isbn=f"queue-{mode}"[:13],
+                )
+                with override_settings(
+                    ALLOWED_HOSTS=["testserver"], BORROWING_MODE=mode
+                ):
+                    self.run_mode(mode, book, users, options["threads"])
+                # free the users' borrowing slots for the next mode
+                BorrowingRecord.objects.filter(book=book).delete()
+        finally:
+            # cascades to the books, records and requests
+            library.delete()
+            author.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def run_mode(self, mode, book, users, threads):
+        payload = {
+            "book_ids": [book.id],
+            "due_date": (date.today() + timedelta(days=14)).isoformat(),
+        }
+        drained = threading.Event()
+        done = threading.Event()
+
+        def drainer():
+            try:
+                while not done.is_set():
+                    if not borrowing_queue.drain():
+                        time.sleep(0.005)
+                borrowing_queue.drain()
+            finally:
+                connections.close_all()
+                drained.set()
+
+        def borrow(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            started = time.perf_counter()
+            try:
+                response = client.post("/api/v1/borrowings/", payload, format="json")
+            finally:
+                connections.close_all()
+            return response.status_code, time.perf_counter() - started
+
+        if mode == "queued":
+            threading.Thread(target=drainer, daemon=True).start()
+        else:
+            drained.set()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(borrow, users))
+        accepted_in = time.perf_counter() - started
+        done.set()
+        drained.wait()
+        settled_in = time.perf_counter() - started
+
+        latencies = [elapsed * 1000 for _, elapsed in results]
+        codes = sorted({code for code, _ in results})
+        book.refresh_from_db()
+        borrowed = BorrowingRecord.objects.filter(book=book).count()
+        self.stdout.write(
+            f"{mode:<7} {len(results) / accepted_in:>8.1f} req/s  "
+            f"p50 {statistics.median(latencies):>8.2f} ms  "
+            f"p99 {percentile(latencies, 99):>8.2f} ms  "
+            f"status {codes}  borrowed {borrowed}  copies left "
+            f"{book.available_copies}"
+        )
+        if mode == "queued":
+            waits = [
+                (processed_at - created_at).total_seconds() * 1000
+                for created_at, processed_at in BorrowingRequest.objects.filter(
+                    user__in=users, processed_at__isnull=False
+                ).values_list("created_at", "processed_at")
+            ]
+            self.stdout.write(
+                f"{'':<7} settled in {settled_in:.2f} s  "
+                f"time to outcome p50 {statistics.median(waits):.2f} ms  "
+                f"p99 {percentile(waits, 99):.2f} ms"
+            )
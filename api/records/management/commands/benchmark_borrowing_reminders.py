@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import connections
+from api.library_management.models import Author, Book, Library
+from api.records.models import BorrowingRecord
+from api.records.tasks import (
+    due_soon,
+    reminder_chunks,
+    send_reminder_chunk,
+    REMINDER_CHUNK_SIZE,
+)
+
+USERNAME_PREFIX = "reminder-benchmark-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the daily reminders for synthetic due-soon borrowings, one "
+        "connection per message versus pooled chunks sent in parallel. Point "
+        "the email settings at a local SMTP stand-in such as Mailhog (the dev "
+        "settings already do) and run against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--records", type=int, default=5000)
+        parser.add_argument("--chunk-size", type=int, default=REMINDER_CHUNK_SIZE)
+        parser.add_argument(
+            "--workers", type=int, default=4, help="Chunks sent concurrently"
+        )
+        parser.add_argument(
+            "--skip-per-message",
+            action="store_true",
+            help="Only time the chunked fan-out",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"email backend {settings.EMAIL_BACKEND} "
+            f"({getattr(settings, 'EMAIL_HOST', '')}:{getattr(settings, 'EMAIL_PORT', '')})"
+        )
+        library = Library.objects.create(
+            name="Reminder benchmark", address="", phone_number=""
+        )
+        author = Author.objects.create(name="Reminder benchmark")
+        try:
+            self.seed(library, author, options["records"])
+            today = date.today()
+            if not options["skip_per_message"]:
+                self.per_message(today)
+            self.chunked(today, options["chunk_size"], options["workers"])
+        finally:
+            # cascades to the book and its borrowing records
+            library.delete()
+            author.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def seed(self, library, author, records):
+        users = User.objects.bulk_create(
+            User(
+                username=f"{USERNAME_PREFIX}{n}",
+                email=f"{USERNAME_PREFIX}{n}@example.com",
+                password="!",
+            )
+            for n in range(records)
+        )
+        book = Book.objects.create(
+            title="Reminder benchmark",
+            author=author,
+            library=library,
+            published_date=date(2000, 1, 1),
+            isbn="reminder",
+        )
+        BorrowingRecord.objects.bulk_create(
+            BorrowingRecord(
+                book=book,
+                user=user,
+                due_date=date.today() + timedelta(days=n % 4),
+            )
+            for n, user in enumerate(users)
+        )
+
+    def per_message(self, today):
+        """The previous behaviour: send_mail, one connection per message."""
+        borrowings = list(
+            due_soon(today)
+            .filter(user__username__startswith=USERNAME_PREFIX)
+            .select_related("user", "book")
+        )
+        started = time.perf_counter()
+        for borrowing in borrowings:
+            send_mail(
+                "Book Return Reminder",
+                f"Your borrowing of '{borrowing.book.title}' is due soon.",
+                settings.DEFAULT_FROM_EMAIL,
+                [borrowing.user.email],
+            )
+        self.report("per message", len(borrowings), time.perf_counter() - started)
+
+    def chunked(self, today, chunk_size, workers):
+        def run(chunk):
+            try:
+                return send_reminder_chunk(today.isoformat(), *chunk)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        chunks = reminder_chunks(today, chunk_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sent = sum(executor.map(run, chunks))
+        elapsed = time.perf_counter() - started
+        self.report(f"{len(chunks)} chunks x{workers}", sent, elapsed)
+        rerun = sum(run(chunk) for chunk in reminder_chunks(today, chunk_size))
+        self.stdout.write(f"rerun of the day sent {rerun} (expected 0)")
+
+    def report(self, label, sent, elapsed):
+        self.stdout.write(
+            f"{label:<20} {sent:>7} messages  {elapsed:>8.2f} s  "
+            f"{sent / max(elapsed, 1e-9):>9.1f} messages/s"
+        )
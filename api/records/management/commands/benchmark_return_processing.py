@@ -0,0 +1,117 @@
+import statistics
+import time
+from collections import Counter
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from api.library_management.models import Author, Book, Library
+from api.records.models import ActiveBorrowingCount, BorrowingRecord
+from api.records.services import BorrowingService
+
+USERNAME_PREFIX = "return-benchmark-"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time BorrowingService.return_records for batches of open records, from "
+        "a single return up to an end-of-day desk batch. Creates and removes "
+        "its own users, books and records; run against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[1, 50, 500])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--books",
+            type=int,
+            default=20,
+            help="Fewer books than records, so a batch returns copies of the same book",
+        )
+
+    def handle(self, *args, **options):
+        sizes, repeat = options["sizes"], options["repeat"]
+        total = sum(sizes) * repeat
+        library = Library.objects.create(
+            name="Return benchmark", address="", phone_number=""
+        )
+        author = Author.objects.create(name="Return benchmark")
+        try:
+            records = self.seed(library, author, options["books"], total)
+            for size in sizes:
+                batches = [records[n * size : (n + 1) * size] for n in range(repeat)]
+                del records[: size * repeat]
+                self.run_size(size, batches)
+        finally:
+            # cascades to the books and their borrowing records
+            library.delete()
+            author.delete()
+            User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def seed(self, library, author, books, total):
+        """``total`` open records, at most MAX_BOOKS_PER_USER per user."""
+        per_user = BorrowingRecord.MAX_BOOKS_PER_USER
+        users = User.objects.bulk_create(
+            User(username=f"{USERNAME_PREFIX}{n}", password="!")
+            for n in range(-(-total // per_user))
+        )
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Return benchmark {n}",
+                author=author,
+                library=library,
+                published_date=date(2000, 1, 1),
+                available_copies=0,
+                isbn=f"ret-{n}",
+            )
+            for n in range(books)
+        )
+        today = date.today()
+        # a third of them overdue, so the penalty arithmetic is exercised
+        records = BorrowingRecord.objects.bulk_create(
+            BorrowingRecord(
+                book=books[n % len(books)],
+                user=users[n // per_user],
+                due_date=today + timedelta(days=n % 21 - 7),
+            )
+            for n in range(total)
+        )
+        ActiveBorrowingCount.objects.rebuild()
+        return [record.pk for record in records]
+
+    def run_size(self, size, batches):
+        latencies = []
+        mismatches = 0
+        for batch in batches:
+            before = dict(
+                Book.objects.filter(borrowings__in=batch).values_list(
+                    "id", "available_copies"
+                )
+            )
+            started = time.perf_counter()
+            BorrowingService.return_records(batch)
+            latencies.append(time.perf_counter() - started)
+            after = dict(
+                Book.objects.filter(id__in=before).values_list("id", "available_copies")
+            )
+            expected = Counter(
+                BorrowingRecord.objects.filter(id__in=batch).values_list(
+                    "book_id", flat=True
+                )
+            )
+            mismatches += any(
+                after[book_id] - before[book_id] != count
+                for book_id, count in expected.items()
+            )
+        penalties_ok = all(
+            record.penalty_amount == record.calculate_penalty()
+            for record in BorrowingRecord.objects.filter(
+                id__in=[pk for batch in batches for pk in batch]
+            )
+        )
+        median = statistics.median(latencies) * 1000
+        self.stdout.write(
+            f"{size:>5} records  median {median:>8.2f} ms  "
+            f"{size / statistics.median(latencies):>9.1f} records/s  "
+            f"copies {'MISMATCH' if mismatches else 'ok'}  "
+            f"penalties {'ok' if penalties_ok else 'MISMATCH'}"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from api.records.retries import counters, reset_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the deadlock, serialization failure, lock timeout and retry "
+        "counters of the borrowing transactions, shared by every worker"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters after printing"
+        )
+
+    def handle(self, *args, **options):
+        for name, value in counters().items():
+            self.stdout.write(f"{name:<24} {value}")
+        if options["reset"]:
+            reset_counters()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,47 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from api.records.partitions import (
+    MONTHS_AHEAD,
+    create_partitions,
+    detach_partitions,
+    month_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the upcoming monthly partitions of returned borrowing records "
+        "and optionally detach (or drop) the old ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=MONTHS_AHEAD,
+            help="Months past the current one to create partitions for",
+        )
+        parser.add_argument(
+            "--detach-before",
+            type=date.fromisoformat,
+            help="Detach the months returned entirely before this date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop the detached partitions instead of keeping them as tables",
+        )
+        parser.add_argument("--list", action="store_true", help="List partitions")
+
+    def handle(self, *args, **options):
+        for name in create_partitions(months_ahead=options["months_ahead"]):
+            self.stdout.write(f"created {name}")
+        if options["detach_before"]:
+            detached = detach_partitions(options["detach_before"], options["drop"])
+            action = "dropped" if options["drop"] else "detached"
+            for name in detached:
+                self.stdout.write(f"{action} {name}")
+        if options["list"]:
+            for month, name in sorted(month_partitions().items()):
+                self.stdout.write(f"{month:%Y-%m}  {name}")
+        self.stdout.write(self.style.SUCCESS("Borrowing partitions are up to date."))
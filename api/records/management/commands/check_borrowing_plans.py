@@ -0,0 +1,92 @@
+import re
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from api.library_management.models import Book
+from api.library_management.synthetic import seed_catalog
+from api.records.models import BorrowingRecord
+from api.records.serializers import BulkReturnInputSerializer
+from api.records.synthetic import seed_borrowings
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot BorrowingRecord queries and fail if any of them "
+        "sequentially scans the table. Only meaningful on a large table: "
+        "--seed inserts synthetic borrowings (10M recommended) into a scratch "
+        "database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Borrowings to insert first"
+        )
+        parser.add_argument(
+            "--seed-books", type=int, default=100_000, help="Books to seed if none"
+        )
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            if not Book.objects.exists():
+                self.stdout.write(f"Seeding {options['seed_books']} books...")
+                seed_catalog(books=options["seed_books"])
+            self.stdout.write(f"Seeding {options['seed']} borrowings...")
+            seed_borrowings(options["seed"])
+
+        sample = (
+            BorrowingRecord.objects.filter(returned_at__isnull=True)
+            .values("user_id", "id")
+            .first()
+        )
+        if sample is None:
+            raise CommandError("No open borrowings to sample; use --seed.")
+        user_id, record_ids = sample["user_id"], [sample["id"]]
+        today = date.today()
+        open_records = BorrowingRecord.objects.filter(returned_at__isnull=True)
+        queries = [
+            ("open borrowings of a user", open_records.filter(user_id=user_id)),
+            (
+                "bulk return input",
+                BulkReturnInputSerializer()
+                .fields["record_ids"]
+                .get_queryset()
+                .filter(pk__in=record_ids),
+            ),
+            (
+                "bulk return ownership check",
+                open_records.filter(id__in=record_ids, user_id=user_id),
+            ),
+            (
+                "reminder window",
+                open_records.filter(
+                    due_date__gte=today, due_date__lte=today + timedelta(days=3)
+                ),
+            ),
+            ("overdue borrowings", open_records.filter(due_date__lt=today)),
+            (
+                "history page",
+                BorrowingRecord.objects.filter(user_id=user_id).order_by(
+                    "-borrowed_at", "-id"
+                )[:20],
+            ),
+        ]
+
+        table = BorrowingRecord._meta.db_table
+        self.stdout.write(f"Borrowings in table: {BorrowingRecord.objects.count()}")
+        failed = []
+        for label, queryset in queries:
+            plan = queryset.explain()
+            if options["verbosity"] > 1:
+                self.stdout.write(plan)
+            if f"Seq Scan on {table}" in plan:
+                failed.append(label)
+                self.stdout.write(self.style.ERROR(f"{label:<30} seq scan"))
+                continue
+            index = re.search(
+                r"(?:Index(?: Only)? Scan(?: Backward)? using|Bitmap Index Scan on)"
+                r" (\w+)",
+                plan,
+            )
+            self.stdout.write(f"{label:<30} {index.group(1) if index else 'no scan'}")
+        if failed:
+            raise CommandError(f"Sequential scans in: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Every hot query uses an index."))
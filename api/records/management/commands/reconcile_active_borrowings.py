@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.records.models import ActiveBorrowingCount
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user active borrowing counters, or verify their drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report drift; exit with an error if any counter is wrong",
+        )
+
+    def handle(self, *args, **options):
+        over_limit = ActiveBorrowingCount.objects.over_limit()
+        if over_limit:
+            # their counters stay capped at the limit until records are returned
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{over_limit} users hold more open borrowings than allowed."
+                )
+            )
+
+        if options["verify"]:
+            drift = ActiveBorrowingCount.objects.drift()
+            self.stdout.write(f"active borrowing counters: {drift} drifted")
+            if drift:
+                raise CommandError("Active borrowing counters have drifted.")
+            self.stdout.write(
+                self.style.SUCCESS("Active borrowing counters are consistent.")
+            )
+            return
+
+        with transaction.atomic():
+            ActiveBorrowingCount.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS("Active borrowing counters rebuilt."))
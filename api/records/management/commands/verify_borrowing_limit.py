@@ -0,0 +1,100 @@
+import threading
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from api.library_management.models import Author, Book, Library
+from api.records.models import ActiveBorrowingCount, BorrowingRecord
+from api.records.services import BorrowingService
+
+USERNAME = "borrow-limit-check"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire parallel borrow requests for one user and check that no more than "
+        "MAX_BOOKS_PER_USER borrowings are ever open and the counter matches. "
+        "Creates and removes its own user and books; run against a scratch "
+        "database with DJANGO_ENV other than development."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--rounds", type=int, default=20)
+        parser.add_argument("--engines", nargs="+", default=["locking", "conditional"])
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        user = User.objects.get_or_create(username=USERNAME)[0]
+        library = Library.objects.create(
+            name="Borrow limit check", address="", phone_number=""
+        )
+        author = Author.objects.create(name="Borrow limit check")
+        books = Book.objects.bulk_create(
+            Book(
+                title=f"Limit check {n}",
+                author=author,
+                library=library,
+                published_date=date(2000, 1, 1),
+                available_copies=options["rounds"] * len(options["engines"]),
+                isbn=f"limit-{n}",
+            )
+            for n in range(threads)
+        )
+        limit = BorrowingRecord.MAX_BOOKS_PER_USER
+        try:
+            for engine in options["engines"]:
+                for _ in range(options["rounds"]):
+                    borrowed = self.race(engine, user, books)
+                    open_records = BorrowingRecord.objects.filter(
+                        user=user, returned_at__isnull=True
+                    ).count()
+                    counter = ActiveBorrowingCount.objects.get(user=user).active
+                    if borrowed > limit or open_records > limit:
+                        raise CommandError(
+                            f"{engine}: {open_records} open borrowings, limit {limit}"
+                        )
+                    if counter != open_records:
+                        raise CommandError(
+                            f"{engine}: counter {counter} != {open_records} open"
+                        )
+                    BorrowingService.return_records(
+                        list(
+                            BorrowingRecord.objects.filter(
+                                user=user, returned_at__isnull=True
+                            ).values_list("id", flat=True)
+                        )
+                    )
+                self.stdout.write(
+                    f"{engine}: limit held over {options['rounds']} rounds of "
+                    f"{threads} parallel requests"
+                )
+        finally:
+            library.delete()
+            author.delete()
+            user.delete()
+        self.stdout.write(self.style.SUCCESS("Borrowing limit holds."))
+
+    def race(self, engine, user, books):
+        """One borrow request per book, all released at once."""
+        due_date = date.today() + timedelta(days=7)
+        start = threading.Barrier(len(books))
+        borrowed = []
+
+        def borrow(book):
+            try:
+                start.wait()
+                BorrowingService.borrow_books(user, [book.id], due_date, engine=engine)
+                borrowed.append(book.id)
+            except ValidationError:
+                pass
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=borrow, args=(book,)) for book in books]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return len(borrowed)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_management', '0005_trigram_name_indexes'),
+        ('records', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowingrecord',
+            index=models.Index(fields=['user', 'borrowed_at', 'id'], name='borrowing_user_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0002_borrowing_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowingrecord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# users already over the limit are capped; reconcile_active_borrowings lists them
+POPULATE_COUNTERS = """
+INSERT INTO records_activeborrowingcount (user_id, active)
+SELECT user_id, LEAST(count(*), 3) FROM records_borrowingrecord
+WHERE returned_at IS NULL
+GROUP BY user_id;
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('records', '0003_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveBorrowingCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='active_borrowing_count', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(('active__lte', 3)), name='active_borrowings_within_limit')],
+            },
+        ),
+        migrations.RunSQL(POPULATE_COUNTERS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_management', '0008_library_book_indexes'),
+        ('records', '0004_active_borrowing_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrowingrecord',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['user'], name='borrowing_open_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowingrecord',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['due_date'], name='borrowing_open_due_date_idx'),
+        ),
+    ]
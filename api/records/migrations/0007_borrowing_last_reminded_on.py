@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0006_outbox_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowingrecord',
+            name='last_reminded_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+    ]
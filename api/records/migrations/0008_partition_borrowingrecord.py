@@ -0,0 +1,93 @@
+# Range-partition records_borrowingrecord on returned_at: open loans (NULL)
+# in the default partition, returned loans in one partition per month.
+#
+# A primary key on a partitioned table must contain the partition key, and
+# returned_at is nullable, so id keeps its sequence and a plain index instead
+# of the primary key constraint. The ORM still treats id as the primary key.
+#
+# Copies the whole table under an exclusive lock; schedule accordingly.
+
+from django.db import migrations
+
+TABLE = "records_borrowingrecord"
+
+INDEXES = [
+    f"CREATE INDEX {TABLE}_book_id_idx ON {TABLE} (book_id)",
+    f"CREATE INDEX {TABLE}_user_id_idx ON {TABLE} (user_id)",
+    f"CREATE INDEX borrowing_user_keyset_idx ON {TABLE} (user_id, borrowed_at, id)",
+    f"CREATE INDEX borrowing_open_user_idx ON {TABLE} (user_id)"
+    f" WHERE returned_at IS NULL",
+    f"CREATE INDEX borrowing_open_due_date_idx ON {TABLE} (due_date)"
+    f" WHERE returned_at IS NULL",
+    f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_book_id_fk_book_id"
+    f" FOREIGN KEY (book_id) REFERENCES library_management_book (id)"
+    f" DEFERRABLE INITIALLY DEFERRED",
+    f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_fk_auth_user_id"
+    f" FOREIGN KEY (user_id) REFERENCES auth_user (id)"
+    f" DEFERRABLE INITIALLY DEFERRED",
+]
+
+MONTH_PARTITIONS = f"""
+DO $$
+DECLARE
+    month timestamp;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', coalesce(min(returned_at), now()) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+            interval '1 month'
+        )
+        FROM {TABLE}_legacy
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF {TABLE} FOR VALUES FROM (%L) TO (%L)',
+            '{TABLE}_' || to_char(month, '"y"YYYY"m"MM'),
+            to_char(month, 'YYYY-MM-DD') || ' 00:00:00+00',
+            to_char(month + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$
+"""
+
+PARTITION = [
+    f"ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy",
+    f"CREATE SEQUENCE {TABLE}_part_id_seq",
+    f"CREATE TABLE {TABLE} (LIKE {TABLE}_legacy INCLUDING DEFAULTS)"
+    f" PARTITION BY RANGE (returned_at)",
+    f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_part_id_seq')",
+    f"ALTER SEQUENCE {TABLE}_part_id_seq OWNED BY {TABLE}.id",
+    f"CREATE TABLE {TABLE}_open PARTITION OF {TABLE} DEFAULT",
+    MONTH_PARTITIONS,
+    f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_legacy",
+    f"SELECT setval('{TABLE}_part_id_seq', coalesce(max(id), 0) + 1, false)"
+    f" FROM {TABLE}",
+    f"DROP TABLE {TABLE}_legacy",
+    f"ALTER SEQUENCE {TABLE}_part_id_seq RENAME TO {TABLE}_id_seq",
+    f"CREATE INDEX {TABLE}_id_idx ON {TABLE} (id)",
+    *INDEXES,
+    f"ANALYZE {TABLE}",
+]
+
+UNPARTITION = [
+    f"ALTER TABLE {TABLE} RENAME TO {TABLE}_partitioned",
+    f"CREATE TABLE {TABLE} (LIKE {TABLE}_partitioned)",
+    f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY,"
+    f" ADD PRIMARY KEY (id)",
+    f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_partitioned",
+    f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'),"
+    f" coalesce(max(id), 0) + 1, false) FROM {TABLE}",
+    f"DROP TABLE {TABLE}_partitioned",
+    *INDEXES,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("records", "0007_borrowing_last_reminded_on"),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION, UNPARTITION),
+    ]
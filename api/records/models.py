@@ -1,9 +1,22 @@
-from django.db import models
-from datetime import date
+from django.db import connections, models
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal
 
 
 class BorrowingRecord(models.Model):
-    DAILY_PENALTY = 10.00
+    """
+    One loan of one book. The table is range-partitioned on ``returned_at``
+    (see ``api.records.partitions``).
+
+    A partitioned table cannot have a primary key without the partition key,
+    so ``id`` is only backed by a sequence and a plain index: the database
+    does not guarantee its uniqueness. Nothing may reference it with a
+    foreign key or rely on it as a conflict target (``ON CONFLICT (id)``).
+    """
+
+    DAILY_PENALTY = Decimal("10.00")
     MAX_BOOKS_PER_USER = 3
 
     book = models.ForeignKey(
@@ -16,6 +29,9 @@ class BorrowingRecord(models.Model):
     due_date = models.DateField()
     returned_at = models.DateTimeField(null=True, blank=True)
     penalty_amount = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    # lets a rerun of the daily reminders skip the loans already done
+    last_reminded_on = models.DateField(null=True, blank=True, editable=False)
 
     def calculate_penalty(self):
         """Calculates penalty based on return date and due date."""
@@ -26,10 +42,258 @@ class BorrowingRecord(models.Model):
 
     def is_overdue(self):
         """Checks if the borrowing record is overdue."""
-        current_check_date = (
-            self.returned_at.date() if self.returned_at else date.today()
-        )
-        return current_check_date > self.due_date
+        return self.overdue(self.due_date, self.returned_at)
+
+    @staticmethod
+    def overdue(due_date, returned_at):
+        """``is_overdue`` for raw column values, as read by ``values()``."""
+        current_check_date = returned_at.date() if returned_at else date.today()
+        return current_check_date > due_date
 
     def __str__(self):
         return f"{self.user.username} borrowed {self.book.title}"
+
+    class Meta:
+        indexes = [
+            # keyset pagination of a user's history on (borrowed_at, id)
+            models.Index(
+                fields=["user", "borrowed_at", "id"], name="borrowing_user_keyset_idx"
+            ),
+            # open borrowings are a small slice of the table and every hot
+            # query (limits, returns, reminders) only looks at them
+            models.Index(
+                fields=["user"],
+                condition=models.Q(returned_at__isnull=True),
+                name="borrowing_open_user_idx",
+            ),
+            models.Index(
+                fields=["due_date"],
+                condition=models.Q(returned_at__isnull=True),
+                name="borrowing_open_due_date_idx",
+            ),
+        ]
+
+
+class ActiveBorrowingCountQuerySet(models.QuerySet):
+    def reserve(self, user_id, count):
+        """
+        Add ``count`` active borrowings to the user's counter unless that would
+        exceed MAX_BOOKS_PER_USER. Returns whether the slots were taken.
+        """
+        if count > BorrowingRecord.MAX_BOOKS_PER_USER:
+            return False
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            # the row lock taken here serializes concurrent borrows of one user
+            cursor.execute(
+                f"INSERT INTO {table} AS t (user_id, active) VALUES (%s, %s)"
+                f" ON CONFLICT (user_id) DO UPDATE SET active = t.active + %s"
+                f" WHERE t.active + %s <= %s RETURNING active",
+                [user_id, count, count, count, BorrowingRecord.MAX_BOOKS_PER_USER],
+            )
+            return cursor.fetchone() is not None
+
+    def lock(self, user_ids):
+        """
+        Lock the counters of ``user_ids`` in user id order, creating missing
+        ones, and return ``{user_id: active}``.
+        """
+        self.bulk_create(
+            [self.model(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        return dict(
+            self.select_for_update()
+            .filter(user_id__in=user_ids)
+            .order_by("user_id")
+            .values_list("user_id", "active")
+        )
+
+    def take(self, counts):
+        """Add ``{user_id: borrowed}`` to counters checked under ``lock()``."""
+        counts = sorted((pk, n) for pk, n in counts.items() if n)
+        if not counts:
+            return
+        table = self.model._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(counts))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS t SET active = t.active + v.n"
+                f" FROM (VALUES {values}) AS v(user_id, n)"
+                f" WHERE t.user_id = v.user_id",
+                [param for row in counts for param in row],
+            )
+
+    def release(self, counts):
+        """Subtract ``{user_id: returned}`` from the counters."""
+        counts = sorted((pk, n) for pk, n in counts.items() if n)
+        if not counts:
+            return
+        table = self.model._meta.db_table
+        values = ", ".join(["(%s, %s)"] * len(counts))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} AS t SET active = GREATEST(t.active - v.n, 0)"
+                f" FROM (VALUES {values}) AS v(user_id, n)"
+                f" WHERE t.user_id = v.user_id",
+                [param for row in counts for param in row],
+            )
+
+    def actual_count(self):
+        """Open records of the outer user, capped like the counter itself."""
+        return Least(
+            Coalesce(
+                models.Subquery(
+                    BorrowingRecord.objects.filter(
+                        user=models.OuterRef("user_id"), returned_at__isnull=True
+                    )
+                    .order_by()
+                    .values("user")
+                    .annotate(count=models.Count("pk"))
+                    .values("count")
+                ),
+                0,
+            ),
+            BorrowingRecord.MAX_BOOKS_PER_USER,
+        )
+
+    def rebuild(self):
+        """Recompute every counter from the open borrowing records."""
+        users = (
+            BorrowingRecord.objects.filter(returned_at__isnull=True)
+            .values_list("user_id", flat=True)
+            .distinct()
+        )
+        self.bulk_create(
+            [self.model(user_id=user_id) for user_id in users], ignore_conflicts=True
+        )
+        return self.update(active=self.actual_count())
+
+    def drift(self):
+        """Number of users whose counter is wrong or missing."""
+        missing = (
+            BorrowingRecord.objects.filter(
+                returned_at__isnull=True, user__active_borrowing_count__isnull=True
+            )
+            .values("user")
+            .distinct()
+            .count()
+        )
+        return self.exclude(active=self.actual_count()).count() + missing
+
+    def over_limit(self):
+        """Users holding more open records than MAX_BOOKS_PER_USER."""
+        return (
+            BorrowingRecord.objects.filter(returned_at__isnull=True)
+            .values("user")
+            .annotate(count=models.Count("pk"))
+            .filter(count__gt=BorrowingRecord.MAX_BOOKS_PER_USER)
+            .count()
+        )
+
+
+class ActiveBorrowingCount(models.Model):
+    """Open borrowings of a user, kept in step with BorrowingRecord."""
+
+    user = models.OneToOneField(
+        "auth.User",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="active_borrowing_count",
+    )
+    active = models.PositiveIntegerField(default=0)
+
+    objects = ActiveBorrowingCountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(active__lte=BorrowingRecord.MAX_BOOKS_PER_USER),
+                name="active_borrowings_within_limit",
+            )
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    A notification written in the same transaction as the change it
+    announces, and delivered after commit by ``api.records.outbox``.
+    """
+
+    BORROWING_CONFIRMATION = "borrowing_confirmation"
+    KIND_CHOICES = [(BORROWING_CONFIRMATION, "Borrowing confirmation")]
+    MAX_ATTEMPTS = 5
+    # doubled after every failed attempt: 1, 2, 4, 8 minutes
+    RETRY_DELAY = timedelta(minutes=1)
+
+    kind = models.CharField(max_length=50, choices=KIND_CHOICES)
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.CASCADE, related_name="outbox_events"
+    )
+    payload = models.JSONField(default=dict)
+    # deliveries are at least once; the key makes a redelivery recognisable
+    dedupe_key = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.kind} for user {self.user_id} ({self.dedupe_key})"
+
+    def failed(self, error, now):
+        """Count a failed delivery and back off before the next one."""
+        self.attempts += 1
+        self.last_error = str(error)
+        self.next_attempt_at = now + self.RETRY_DELAY * 2 ** (self.attempts - 1)
+
+    class Meta:
+        indexes = [
+            # the dispatcher only ever scans the pending events, oldest first
+            models.Index(
+                fields=["id"],
+                condition=models.Q(dispatched_at__isnull=True),
+                name="outbox_pending_idx",
+            )
+        ]
+
+
+class BorrowingRequest(models.Model):
+    """
+    A bulk borrow accepted in the queued borrowing mode, allocated later by
+    ``api.records.borrowing_queue`` in first-come, first-served order.
+    """
+
+    PENDING = "pending"
+    COMPLETED = "completed"
+    REJECTED = "rejected"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (COMPLETED, "Completed"),
+        (REJECTED, "Rejected"),
+    ]
+
+    user = models.ForeignKey(
+        "auth.User", on_delete=models.CASCADE, related_name="borrowing_requests"
+    )
+    book_ids = models.JSONField()
+    due_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True)
+    record_ids = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Borrowing request {self.id} by user {self.user_id} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # the queue: pending requests in arrival order
+            models.Index(
+                fields=["id"],
+                condition=models.Q(status="pending"),
+                name="borrowing_request_pending_idx",
+            )
+        ]
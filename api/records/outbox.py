@@ -0,0 +1,167 @@
+"""
+Transactional outbox for borrowing notifications.
+
+Services call ``enqueue_*`` inside their transaction, so an event exists
+exactly when the change it announces was committed. ``dispatch`` drains the
+pending events in batches: rows are claimed with ``SKIP LOCKED`` so several
+workers can drain concurrently, events of the same user are coalesced into
+one email, and a batch is sent over a single SMTP connection.
+
+A delivery is marked only after the send returned, so a worker dying in
+between sends the email again on the next run. Each email carries a
+``Message-ID`` derived from the events' dedupe keys, which lets the
+receiving side recognise such a redelivery.
+
+A failed send backs the event off exponentially (``next_attempt_at``), and
+a run stops after the first batch with failures: a broken mail server is
+retried on later runs, not hammered until ``MAX_ATTEMPTS`` is spent.
+"""
+
+import hashlib
+import logging
+import smtplib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BorrowingRecord, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_BATCH_SIZE = 500
+
+
+def enqueue_borrowing_confirmation(user, records):
+    """Record that ``user`` must be told about the new ``records``."""
+    enqueue_borrowing_confirmations([(user.pk, records)])
+
+
+def enqueue_borrowing_confirmations(borrows):
+    """One event per ``(user_id, records)`` borrow, in a single INSERT."""
+    events = []
+    for user_id, records in borrows:
+        record_ids = sorted(record.id for record in records)
+        events.append(
+            OutboxEvent(
+                kind=OutboxEvent.BORROWING_CONFIRMATION,
+                user_id=user_id,
+                payload={"borrowing_ids": record_ids},
+                dedupe_key=f"{OutboxEvent.BORROWING_CONFIRMATION}:{record_ids[0]}",
+            )
+        )
+    if not events:
+        return
+    OutboxEvent.objects.bulk_create(events)
+    # wake the dispatcher now; its periodic run picks up anything missed
+    from .tasks import dispatch_outbox
+
+    transaction.on_commit(dispatch_outbox.delay)
+
+
+def dispatch(batch_size=DISPATCH_BATCH_SIZE):
+    """Deliver pending events until none are left; returns how many were."""
+    delivered = 0
+    while True:
+        claimed, sent = _dispatch_batch(batch_size)
+        delivered += sent
+        if claimed < batch_size or sent < claimed:
+            return delivered
+
+
+@transaction.atomic
+def _dispatch_batch(batch_size):
+    now = timezone.now()
+    events = list(
+        OutboxEvent.objects.select_for_update(skip_locked=True)
+        .filter(
+            dispatched_at__isnull=True,
+            attempts__lt=OutboxEvent.MAX_ATTEMPTS,
+            next_attempt_at__lte=now,
+        )
+        .select_related("user")
+        .order_by("id")[:batch_size]
+    )
+    if not events:
+        return 0, 0
+    by_user = defaultdict(list)
+    for event in events:
+        by_user[event.user].append(event)
+    records = BorrowingRecord.objects.select_related("book").in_bulk(
+        [pk for event in events for pk in event.payload.get("borrowing_ids", [])]
+    )
+
+    delivered = []
+    with get_connection() as connection:
+        for user, user_events in by_user.items():
+            if not user.email:
+                logger.warning(f"No email for user {user.username}, skipping outbox")
+                delivered.extend(user_events)
+                continue
+            message = _borrowing_confirmation(user, user_events, records)
+            if message is None:
+                # the records were deleted since
+                delivered.extend(user_events)
+                continue
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                logger.error(f"Error sending outbox email to {user.username}: {e}")
+                for event in user_events:
+                    event.failed(e, now)
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    # the rest of the batch needs a new session, not this error
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception as error:
+                        # leave the remaining events untouched for a later run
+                        logger.error(
+                            f"Could not reconnect to send outbox email: {error}"
+                        )
+                        break
+                continue
+            delivered.extend(user_events)
+    for event in delivered:
+        event.dispatched_at = now
+    OutboxEvent.objects.bulk_update(
+        events, ["dispatched_at", "attempts", "next_attempt_at", "last_error"]
+    )
+    return len(events), len(delivered)
+
+
+def _borrowing_confirmation(user, events, records):
+    borrowings = [
+        records[pk]
+        for event in events
+        for pk in event.payload.get("borrowing_ids", [])
+        if pk in records
+    ]
+    if not borrowings:
+        return None
+    if len(borrowings) == 1:
+        borrowing = borrowings[0]
+        body = (
+            f"You have successfully borrowed '{borrowing.book.title}'. "
+            f"Please return by {borrowing.due_date.strftime('%Y-%m-%d')}.\n\n"
+        )
+    else:
+        lines = "\n".join(
+            f"- '{borrowing.book.title}', due "
+            f"{borrowing.due_date.strftime('%Y-%m-%d')}"
+            for borrowing in borrowings
+        )
+        body = f"You have successfully borrowed:\n{lines}\n\n"
+    keys = "\n".join(sorted(event.dedupe_key for event in events))
+    return EmailMessage(
+        "Book Borrowing Confirmation",
+        f"Dear {user.username},\n\n{body}Thank you!",
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        headers={
+            "Message-ID": f"<{hashlib.sha256(keys.encode()).hexdigest()}@{DNS_NAME}>"
+        },
+    )
@@ -0,0 +1,119 @@
+"""
+Maintenance of the partitioned BorrowingRecord table.
+
+``records_borrowingrecord`` is range-partitioned on ``returned_at``
+(migration 0008). Open loans have no ``returned_at`` and live in the default
+partition, ``records_borrowingrecord_open``, so every query on open loans
+(``returned_at IS NULL``) is pruned to that small, hot partition however much
+history accumulates. Returned loans move into one partition per month of
+their return, which can be detached once they are no longer needed online.
+Queries that are not restricted on ``returned_at``, such as a user's whole
+history, visit every partition and slow down as months are added; keeping
+the attached months bounded with ``detach_partitions`` keeps them in check.
+
+Month partitions have to exist before loans are returned into them, or the
+rows land in the open partition. ``create_partitions`` creates them ahead of
+time (``manage.py borrowing_partitions``, and daily from Celery beat) and
+moves any such strays into the partition it creates.
+"""
+
+from datetime import date, datetime, timezone
+
+from django.db import connections, transaction
+
+from .models import BorrowingRecord
+
+PARENT = BorrowingRecord._meta.db_table
+OPEN_PARTITION = f"{PARENT}_open"
+MONTHS_AHEAD = 3
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, months):
+    months += month.year * 12 + month.month - 1
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_y{month:%Y}m{month:%m}"
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def month_partitions(using="default"):
+    """``{month: table}`` of the month partitions currently attached."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i"
+            " JOIN pg_class c ON c.oid = i.inhrelid"
+            " WHERE i.inhparent = %s::regclass",
+            [PARENT],
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    prefix = f"{PARENT}_y"
+    return {
+        date(int(name[len(prefix) :][:4]), int(name[-2:]), 1): name
+        for name in names
+        if name.startswith(prefix)
+    }
+
+
+def create_partitions(start=None, months_ahead=MONTHS_AHEAD, using="default"):
+    """
+    Create the missing month partitions from ``start`` (default: this month)
+    through ``months_ahead`` months from now. Returns the tables created.
+    """
+    this_month = month_start(date.today())
+    month = month_start(start) if start else this_month
+    last = add_months(this_month, months_ahead)
+    existing = month_partitions(using)
+    created = []
+    while month <= last:
+        if month not in existing:
+            _create_partition(month, using)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def _create_partition(month, using):
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        # built detached, so loans already returned into this month while it
+        # was missing can be moved out of the open partition first
+        cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+        cursor.execute(
+            f"WITH strays AS ("
+            f" DELETE FROM {OPEN_PARTITION}"
+            f" WHERE returned_at >= %s AND returned_at < %s RETURNING *"
+            f") INSERT INTO {name} SELECT * FROM strays",
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION {name}"
+            f" FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+
+
+def detach_partitions(before, drop=False, using="default"):
+    """
+    Detach the month partitions entirely before ``before``, keeping them as
+    standalone tables unless ``drop``. Returns the tables detached.
+    """
+    detached = []
+    for month, name in sorted(month_partitions(using).items()):
+        if add_months(month, 1) > month_start(before):
+            break
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {PARENT} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+        detached.append(name)
+    return detached
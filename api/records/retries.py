@@ -0,0 +1,120 @@
+"""
+Retrying borrowing transactions that lose a lock race.
+
+Deadlocks and serialization failures abort the whole transaction, but
+rerunning it usually succeeds, so ``retry_transaction`` does that a bounded
+number of times with full-jitter exponential backoff. Lock timeouts are left
+to the caller: they mean the rows are busy, and the client is better placed
+to decide when to come back.
+
+Outcomes are counted in the shared cache so every worker process reports to
+the same totals (see ``manage.py borrowing_lock_stats``).
+"""
+
+import functools
+import logging
+import random
+import time
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from psycopg2 import errorcodes
+
+logger = logging.getLogger(__name__)
+
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.02
+RETRY_MAX_DELAY = 0.5
+
+DEADLOCKS = "deadlocks"
+SERIALIZATION_FAILURES = "serialization_failures"
+LOCK_TIMEOUTS = "lock_timeouts"
+RETRIES = "retries"
+EXHAUSTED = "exhausted"
+COUNTERS = (DEADLOCKS, SERIALIZATION_FAILURES, LOCK_TIMEOUTS, RETRIES, EXHAUSTED)
+
+RETRYABLE = {
+    errorcodes.DEADLOCK_DETECTED: DEADLOCKS,
+    errorcodes.SERIALIZATION_FAILURE: SERIALIZATION_FAILURES,
+}
+
+
+def _counter_key(name):
+    return f"borrowing:locks:{name}"
+
+
+def count(name):
+    # statistics only: a cache outage must not change the request's outcome
+    key = _counter_key(name)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # incr() on a missing key; add() loses to a concurrent first write
+            if not cache.add(key, 1, timeout=None):
+                cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Could not count {name} borrowing lock events: {e}")
+
+
+def counters():
+    values = cache.get_many([_counter_key(name) for name in COUNTERS])
+    return {name: values.get(_counter_key(name), 0) for name in COUNTERS}
+
+
+def reset_counters():
+    cache.delete_many([_counter_key(name) for name in COUNTERS])
+
+
+def sqlstate(error):
+    """The Postgres SQLSTATE behind a Django ``DatabaseError``, if any."""
+    return getattr(error.__cause__, "pgcode", None)
+
+
+def is_lock_timeout(error):
+    return sqlstate(error) == errorcodes.LOCK_NOT_AVAILABLE
+
+
+def retry_transaction(
+    func=None,
+    *,
+    attempts=RETRY_ATTEMPTS,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+):
+    """
+    Rerun ``func`` after a deadlock or serialization failure.
+
+    ``func`` must open the transaction itself (wrap it in
+    ``transaction.atomic``). Called inside an outer transaction it runs only
+    once, since the aborted outer transaction cannot be retried from here.
+    """
+    if func is None:
+        return functools.partial(
+            retry_transaction,
+            attempts=attempts,
+            base_delay=base_delay,
+            max_delay=max_delay,
+        )
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(1, attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except DatabaseError as error:
+                if is_lock_timeout(error):
+                    count(LOCK_TIMEOUTS)
+                reason = RETRYABLE.get(sqlstate(error))
+                if reason is None:
+                    raise
+                count(reason)
+                if attempt == attempts:
+                    count(EXHAUSTED)
+                    raise
+                count(RETRIES)
+                time.sleep(random.uniform(0, min(max_delay, base_delay * 2**attempt)))
+
+    return wrapper
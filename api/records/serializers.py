@@ -1,12 +1,14 @@
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from datetime import date
-from .models import BorrowingRecord
+from .models import BorrowingRecord, BorrowingRequest
 from api.library_management.serializers import BookSerializer
 from api.library_management.models import Book
+from api.library_management.eager_loading import EagerLoadingMixin
+from api.library_management.fields import PrimaryKeyListField
 
 
-class BorrowingRecordOutputSerializer(serializers.ModelSerializer):
+class BorrowingRecordOutputSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     book = BookSerializer(read_only=True)
     user = serializers.StringRelatedField(read_only=True)
     is_overdue = serializers.BooleanField(read_only=True)
@@ -27,11 +29,17 @@ class BorrowingRecordOutputSerializer(serializers.ModelSerializer):
             "penalty_amount",
         ]
         read_only_fields = fields
+        select_related = ["user"]
+        fast_values = {
+            "user": "user__username",
+            "is_overdue": (("due_date", "returned_at"), BorrowingRecord.overdue),
+        }
 
 
 class BulkBorrowingInputSerializer(serializers.Serializer):
-    book_ids = serializers.ListField(
-        child=serializers.PrimaryKeyRelatedField(queryset=Book.objects.all()),
+    # resolved in one query, with what the output serializer renders
+    book_ids = PrimaryKeyListField(
+        queryset=Book.objects.select_related("author", "category", "library"),
         allow_empty=False,
         write_only=True,
     )
@@ -52,23 +60,54 @@ class BulkBorrowingInputSerializer(serializers.Serializer):
 
 
 class BulkReturnInputSerializer(serializers.Serializer):
-    record_ids = serializers.ListField(
-        child=serializers.PrimaryKeyRelatedField(
-            queryset=BorrowingRecord.objects.filter(returned_at__isnull=True)
-        ),
+    record_ids = PrimaryKeyListField(
+        queryset=BorrowingRecord.objects.filter(
+            returned_at__isnull=True
+        ).select_related("book__author", "book__category", "book__library", "user"),
         allow_empty=False,
         write_only=True,
     )
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     def validate_record_ids(self, value):
-        # Ensure all provided record IDs belong to the current user
+        # Ensure all provided record IDs belong to the current user, checked
+        # on the records already fetched by the field
         user = self.context["request"].user
-        user_records_count = BorrowingRecord.objects.filter(
-            id__in=[record.id for record in value], user=user, returned_at__isnull=True
-        ).count()
-        if user_records_count != len(value):
+        user_records = {record.id for record in value if record.user_id == user.id}
+        if len(user_records) != len(value):
             raise serializers.ValidationError(
                 "One or more invalid or already returned record IDs provided."
             )
         return value
+
+
+class BorrowingRequestSerializer(serializers.ModelSerializer):
+    """A queued borrow and, once allocated, the records it created."""
+
+    records = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BorrowingRequest
+        fields = [
+            "id",
+            "status",
+            "error",
+            "book_ids",
+            "due_date",
+            "created_at",
+            "processed_at",
+            "records",
+        ]
+        read_only_fields = fields
+
+    def get_records(self, obj):
+        if obj.status != BorrowingRequest.COMPLETED:
+            return []
+        records = (
+            BorrowingRecord.objects.filter(id__in=obj.record_ids)
+            .select_related("book__author", "book__category", "book__library", "user")
+            .order_by("id")
+        )
+        return BorrowingRecordOutputSerializer(
+            records, many=True, context=self.context
+        ).data
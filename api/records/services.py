@@ -1,32 +1,54 @@
+from collections import Counter
 from datetime import date, timedelta
-import os
-from django.db import transaction, DatabaseError
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
 from django.db.models import F
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from api.library_management.models import Book
-from .models import BorrowingRecord
-from .tasks import send_borrowing_confirmation
+from api.library_management.caching import (
+    BOOK_AVAILABILITY,
+    bump_generations_on_commit,
+)
+from .models import ActiveBorrowingCount, BorrowingRecord
+from .retries import is_lock_timeout, retry_transaction
+from .outbox import enqueue_borrowing_confirmation
+
+# values of settings.BORROWING_ENGINE, checked when the app loads
+BORROWING_ENGINES = ("locking", "conditional")
+
+
+class BorrowingBusy(Exception):
+    """The rows stayed locked for longer than BORROWING_LOCK_TIMEOUT_MS."""
 
 
 class BorrowingService:
-    """Service for handling the business logic for borrowing and returning books."""
+    """
+    Service for handling the business logic for borrowing and returning books.
+
+    Every transaction takes its row locks in the same order, so overlapping
+    requests queue instead of deadlocking: the users' ActiveBorrowingCount
+    rows by user id, then BorrowingRecord rows by id, then Book rows by id.
+    """
 
     @staticmethod
-    def _validate_borrowing_limit(user, num_books_to_borrow):
-        """Protected method to check the borrowing limit for a user"""
-        active_borrowings = BorrowingRecord.objects.filter(
-            user=user, returned_at__isnull=True
-        ).count()
-        if (
-            active_borrowings + num_books_to_borrow
-        ) > BorrowingRecord.MAX_BOOKS_PER_USER:
-            allowed = BorrowingRecord.MAX_BOOKS_PER_USER - active_borrowings
-            raise ValidationError(
-                f"Cannot borrow {num_books_to_borrow} more books. "
-                f"You have {active_borrowings} active borrowings. "
-                f"You can borrow {max(0, allowed)} more."
-            )
+    def _reserve_borrowing_slots(user, num_books_to_borrow):
+        """Protected method to take borrowing slots within the user's limit"""
+        # one guarded update of the user's counter row, not count-then-insert
+        if ActiveBorrowingCount.objects.reserve(user.pk, num_books_to_borrow):
+            return
+        active_borrowings = (
+            ActiveBorrowingCount.objects.filter(user=user)
+            .values_list("active", flat=True)
+            .first()
+            or 0
+        )
+        allowed = BorrowingRecord.MAX_BOOKS_PER_USER - active_borrowings
+        raise ValidationError(
+            f"Cannot borrow {num_books_to_borrow} more books. "
+            f"You have {active_borrowings} active borrowings. "
+            f"You can borrow {max(0, allowed)} more."
+        )
 
     @staticmethod
     def _validate_due_date(due_date):
@@ -38,103 +60,305 @@ class BorrowingService:
             raise ValidationError("Due date cannot be in the past")
 
     @staticmethod
+    def _set_lock_timeout():
+        """Fail fast instead of queueing on a busy row, when configured."""
+        if settings.BORROWING_LOCK_TIMEOUT_MS:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"SET LOCAL lock_timeout = {int(settings.BORROWING_LOCK_TIMEOUT_MS)}"
+                )
+
+    @staticmethod
+    def borrow_books(user, book_ids, due_date, engine=None):
+        # ids or the Book instances the input serializer already fetched
+        try:
+            return BorrowingService._borrow_books(user, book_ids, due_date, engine)
+        except ValidationError:
+            raise
+        except DatabaseError as e:
+            if is_lock_timeout(e):
+                raise BorrowingBusy(
+                    "The requested books are being borrowed by someone else. Please try again."
+                )
+            raise ValidationError(
+                "Could not process borrowing request due to a database issue. Please try again."
+            )
+        except Exception as e:
+            raise Exception("An unexpected error occurred during borrowing.")
+
+    @staticmethod
+    @retry_transaction
     @transaction.atomic
-    def borrow_books(user, book_ids, due_date):
+    def _borrow_books(user, book_ids, due_date, engine):
         num_books = len(book_ids)
         if num_books == 0:
             raise ValidationError("No book IDs provided.")
-        distinct_book_ids = list(set(book_ids))
-        if len(distinct_book_ids) != num_books:
-            num_books = len(distinct_book_ids)
-        BorrowingService._validate_borrowing_limit(user, num_books)
+        books = {getattr(book, "pk", book): book for book in book_ids}
+        if len(books) != num_books:
+            num_books = len(books)
         BorrowingService._validate_due_date(due_date)
-        records_to_create = []
-        try:
-            locked_books = list(
-                Book.objects.select_for_update().filter(id__in=distinct_book_ids)
+        BorrowingService._set_lock_timeout()
+        BorrowingService._reserve_borrowing_slots(user, num_books)
+        engine = engine or settings.BORROWING_ENGINE
+        if engine == "conditional":
+            created_records = BorrowingService._take_copies_conditionally(
+                user, books, due_date
+            )
+        else:
+            created_records = BorrowingService._take_copies_locking(
+                user, books, due_date
             )
-            locked_books_dict = {b.id: b for b in locked_books}
-            if len(locked_books) != len(distinct_book_ids):
-                missing_ids = set(distinct_book_ids) - set(locked_books_dict.keys())
+        bump_generations_on_commit(BOOK_AVAILABILITY)
+        # committed or rolled back together with the records
+        enqueue_borrowing_confirmation(user, created_records)
+        return created_records
+
+    @staticmethod
+    def _book_title(book):
+        if isinstance(book, Book):
+            return book.title
+        return Book.objects.values_list("title", flat=True).get(pk=book)
+
+    @staticmethod
+    def _new_record(book, user, due_date, available_copies, **fields):
+        """An in-memory record for ``book``, which may be an instance or an id."""
+        if isinstance(book, Book):
+            book.available_copies = available_copies
+            return BorrowingRecord(book=book, user=user, due_date=due_date, **fields)
+        return BorrowingRecord(book_id=book, user=user, due_date=due_date, **fields)
+
+    @staticmethod
+    def _take_copies_locking(user, books, due_date):
+        """Lock the books, check and decrement their copies in Python."""
+        # only the counters are read under the lock; the rest of each book
+        # is the instance passed in, when there is one
+        locked_copies = dict(
+            Book.objects.select_for_update()
+            .filter(id__in=list(books))
+            .order_by("id")
+            .values_list("id", "available_copies")
+        )
+        if len(locked_copies) != len(books):
+            missing_ids = set(books) - set(locked_copies)
+            raise ValidationError(
+                f"One or more requested books do not exist. Missing IDs: {missing_ids}"
+            )
+        for book_id, book in books.items():
+            if locked_copies[book_id] < 1:
                 raise ValidationError(
-                    f"One or more requested books do not exist. Missing IDs: {missing_ids}"
+                    f"Book '{BorrowingService._book_title(book)}' (ID: {book_id}) is not available."
                 )
-            for book_id in distinct_book_ids:
-                book = locked_books_dict[book_id]
-                if book.available_copies < 1:
-                    raise ValidationError(
-                        f"Book '{book.title}' (ID: {book.id}) is not available."
-                    )
-                records_to_create.append(
-                    BorrowingRecord(book=book, user=user, due_date=due_date)
+        created_records = BorrowingRecord.objects.bulk_create(
+            [
+                BorrowingService._new_record(
+                    book, user, due_date, locked_copies[book_id] - 1
                 )
-                book.available_copies -= 1
-            created_records = BorrowingRecord.objects.bulk_create(records_to_create)
-            Book.objects.bulk_update(locked_books, ["available_copies"])
-            borrowing_ids = [record.id for record in created_records]
-            if os.getenv("DJANGO_ENV") == "development":
-                send_borrowing_confirmation.delay(borrowing_ids)
-            return created_records
-        except DatabaseError as e:
+                for book_id, book in books.items()
+            ]
+        )
+        Book.objects.filter(id__in=list(books)).update(
+            available_copies=F("available_copies") - 1
+        )
+        return created_records
+
+    @staticmethod
+    def _take_copies_conditionally(user, books, due_date):
+        """
+        Decrement every available book and insert its record in one statement.
+
+        Row locks last only from the UPDATE to the commit, with no Python
+        work in between. A book that is missing or out of copies yields no
+        row, and the raised ValidationError rolls the rest back.
+        """
+        book_ids = list(books)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                # an UPDATE locks in scan order; lock by id first
+                f"WITH locked AS ("
+                f" SELECT id FROM {Book._meta.db_table}"
+                f" WHERE id = ANY(%s) AND available_copies > 0"
+                f" ORDER BY id FOR UPDATE"
+                f"), taken AS ("
+                f" UPDATE {Book._meta.db_table} AS b"
+                f" SET available_copies = b.available_copies - 1, updated_at = now()"
+                f" FROM locked WHERE b.id = locked.id"
+                f" RETURNING b.id, b.available_copies"
+                f"), created AS ("
+                f" INSERT INTO {BorrowingRecord._meta.db_table}"
+                f" (book_id, user_id, borrowed_at, due_date, penalty_amount,"
+                f" updated_at)"
+                f" SELECT id, %s, now(), %s, 0, now() FROM taken"
+                f" RETURNING id, book_id, borrowed_at, penalty_amount, updated_at"
+                f") SELECT created.*, taken.available_copies"
+                f" FROM created JOIN taken ON taken.id = created.book_id",
+                [book_ids, user.pk, due_date],
+            )
+            rows = cursor.fetchall()
+        if len(rows) != len(book_ids):
+            taken = {book_id for _, book_id, *_ in rows}
+            existing = set(
+                Book.objects.filter(id__in=book_ids).values_list("id", flat=True)
+            )
+            missing_ids = set(book_ids) - existing
+            if missing_ids:
+                raise ValidationError(
+                    f"One or more requested books do not exist. Missing IDs: {missing_ids}"
+                )
+            book_id = min(set(book_ids) - taken)
             raise ValidationError(
-                "Could not process borrowing request due to a database issue. Please try again."
+                f"Book '{BorrowingService._book_title(books[book_id])}' (ID: {book_id}) is not available."
+            )
+        # built from the RETURNING rows instead of being read back
+        created_records = []
+        for record_id, book_id, borrowed_at, penalty, updated_at, copies in sorted(
+            rows
+        ):
+            created_records.append(
+                BorrowingService._new_record(
+                    books[book_id],
+                    user,
+                    due_date,
+                    copies,
+                    id=record_id,
+                    borrowed_at=borrowed_at,
+                    penalty_amount=penalty,
+                    updated_at=updated_at,
+                )
             )
+        return created_records
+
+    @staticmethod
+    def return_records(record_ids):
+        # ids or the BorrowingRecord instances the input serializer fetched
+        try:
+            return BorrowingService._return_records(record_ids)
         except ValidationError:
             raise
+        except DatabaseError as e:
+            if is_lock_timeout(e):
+                raise BorrowingBusy(
+                    "The records are being updated by another request. Please try again."
+                )
+            raise ValidationError(
+                "Could not process return request due to a database issue. Please try again."
+            )
         except Exception as e:
-            raise Exception("An unexpected error occurred during borrowing.")
+            raise Exception("An unexpected error occurred during return.")
 
     @staticmethod
+    @retry_transaction
     @transaction.atomic
-    def return_records(record_ids):
+    def _return_records(record_ids):
         if not record_ids:
             raise ValidationError("No record IDs provided for return.")
-        distinct_record_ids = list(set(record_ids))
-        returned_records_update_list = []
-        book_ids_to_increment = []
-        now = timezone.now()
-        try:
-            locked_records = list(
-                BorrowingRecord.objects.select_related("book")
-                .select_for_update(of=("self", "book"))
-                .filter(id__in=distinct_record_ids)
+        records = {getattr(record, "pk", record): record for record in record_ids}
+        distinct_record_ids = list(records)
+        BorrowingService._set_lock_timeout()
+        # the counters come first in the lock order, released below
+        list(
+            ActiveBorrowingCount.objects.select_for_update()
+            .filter(
+                user_id__in=BorrowingRecord.objects.filter(
+                    id__in=distinct_record_ids
+                ).values("user_id")
             )
-            locked_records_dict = {r.id: r for r in locked_records}
-            if len(locked_records) != len(distinct_record_ids):
-                missing_ids = set(distinct_record_ids) - set(locked_records_dict.keys())
-                raise ValidationError(
-                    f"One or more borrowing records not found or inaccessible. Missing/Inaccessible IDs: {missing_ids}"
-                )
-            # Prepare updates
-            for record_id in distinct_record_ids:
-                record = locked_records_dict[record_id]
-                if record.returned_at:
-                    raise ValidationError(
-                        f"Record ID {record.id} for book '{record.book.title}' has already been returned."
-                    )
-                record.returned_at = now
-                overdue_days = 0
-                if record.due_date < now.date():
-                    overdue_days = (now.date() - record.due_date).days
-                record.penalty_amount = max(
-                    0, overdue_days * float(BorrowingRecord.DAILY_PENALTY)
-                )
-                returned_records_update_list.append(record)
-                book_ids_to_increment.append(record.book_id)
-            # Perform bulk updates
-            BorrowingRecord.objects.bulk_update(
-                returned_records_update_list, ["returned_at", "penalty_amount"]
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+        rows = BorrowingService._close_records(distinct_record_ids, timezone.now())
+        if len(rows) != len(distinct_record_ids):
+            BorrowingService._raise_not_returnable(
+                set(distinct_record_ids) - {row[0] for row in rows}
             )
-            if book_ids_to_increment:
-                Book.objects.filter(id__in=book_ids_to_increment).update(
-                    available_copies=F("available_copies") + 1
-                )
-            return returned_records_update_list
-        except DatabaseError as e:
+        ActiveBorrowingCount.objects.release(Counter(row[2] for row in rows))
+        bump_generations_on_commit(BOOK_AVAILABILITY)
+        return BorrowingService._returned_records(records, rows)
+
+    @staticmethod
+    def _close_records(record_ids, now):
+        """
+        Return the open records and restock their books in one statement.
+
+        The penalty is computed in numeric arithmetic by the database, and
+        the books are incremented once per book by the number of records
+        returned for it. Records that are missing or already returned yield
+        no row.
+        """
+        with connection.cursor() as cursor:
+            # records, then books, each locked in id order
+            cursor.execute(
+                f"WITH locked AS ("
+                f" SELECT id FROM {BorrowingRecord._meta.db_table}"
+                f" WHERE id = ANY(%s) AND returned_at IS NULL"
+                f" ORDER BY id FOR UPDATE"
+                f"), returned AS ("
+                f" UPDATE {BorrowingRecord._meta.db_table} AS br"
+                f" SET returned_at = %s, updated_at = %s,"
+                f" penalty_amount = GREATEST(%s::date - br.due_date, 0) * %s"
+                f" FROM locked WHERE br.id = locked.id"
+                f" RETURNING br.id, br.book_id, br.user_id, br.returned_at,"
+                f" br.penalty_amount, br.updated_at"
+                f"), books AS ("
+                f" SELECT id FROM {Book._meta.db_table}"
+                f" WHERE id IN (SELECT book_id FROM returned)"
+                f" ORDER BY id FOR UPDATE"
+                f"), restocked AS ("
+                f" UPDATE {Book._meta.db_table} AS b"
+                f" SET available_copies = b.available_copies + r.copies,"
+                f" updated_at = %s"
+                f" FROM (SELECT book_id, count(*) AS copies FROM returned"
+                f" GROUP BY book_id) AS r, books"
+                f" WHERE b.id = r.book_id AND books.id = r.book_id"
+                f" RETURNING b.id, b.available_copies"
+                f") SELECT returned.*, restocked.available_copies"
+                f" FROM returned JOIN restocked ON restocked.id = returned.book_id",
+                [
+                    record_ids,
+                    now,
+                    now,
+                    now.date(),
+                    BorrowingRecord.DAILY_PENALTY,
+                    now,
+                ],
+            )
+            return cursor.fetchall()
+
+    @staticmethod
+    def _raise_not_returnable(record_ids):
+        found = {
+            record.id: record
+            for record in BorrowingRecord.objects.select_related("book").filter(
+                id__in=record_ids
+            )
+        }
+        if len(found) != len(record_ids):
+            missing_ids = set(record_ids) - set(found)
             raise ValidationError(
-                "Could not process return request due to a database issue. Please try again."
+                f"One or more borrowing records not found or inaccessible. Missing/Inaccessible IDs: {missing_ids}"
             )
-        except ValidationError:
-            raise
-        except Exception as e:
-            raise Exception("An unexpected error occurred during return.")
+        record = found[min(found)]
+        raise ValidationError(
+            f"Record ID {record.id} for book '{record.book.title}' has already been returned."
+        )
+
+    @staticmethod
+    def _returned_records(records, rows):
+        """The returned records in input order, loading only those given by id."""
+        to_load = [
+            pk
+            for pk, record in records.items()
+            if not isinstance(record, BorrowingRecord)
+        ]
+        if to_load:
+            records.update(
+                BorrowingRecord.objects.select_related(
+                    "book__author", "book__category", "book__library", "user"
+                ).in_bulk(to_load)
+            )
+        for record_id, _, _, returned_at, penalty, updated_at, copies in rows:
+            record = records[record_id]
+            record.returned_at = returned_at
+            record.penalty_amount = penalty
+            record.updated_at = updated_at
+            record.book.available_copies = copies
+        return list(records.values())
@@ -0,0 +1,41 @@
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from .models import ActiveBorrowingCount, BorrowingRecord
+
+
+@receiver(pre_save, sender=BorrowingRecord)
+def move_active_borrowing(sender, instance, using, **kwargs):
+    # records saved one by one (the admin, the ORM): inserts of open records,
+    # returns, un-returns and changes of user. BorrowingService keeps the
+    # counters itself and writes with bulk_create and UPDATE statements, which
+    # send no signals. Reserved before the write, so a refused record is never
+    # written.
+    holder = None
+    if not instance._state.adding:
+        stored = (
+            BorrowingRecord.objects.using(using)
+            .filter(pk=instance.pk)
+            .values_list("user_id", "returned_at")
+            .first()
+        )
+        if stored is not None and stored[1] is None:
+            holder = stored[0]
+    needs = instance.user_id if instance.returned_at is None else None
+    if holder == needs:
+        return
+    counters = ActiveBorrowingCount.objects.using(using)
+    if needs is not None and not counters.reserve(needs, 1):
+        raise ValidationError(
+            f"User {needs} already has "
+            f"{BorrowingRecord.MAX_BOOKS_PER_USER} active borrowings."
+        )
+    if holder is not None:
+        counters.release({holder: 1})
+
+
+@receiver(post_delete, sender=BorrowingRecord)
+def release_active_borrowing(sender, instance, using, **kwargs):
+    # open records deleted through the API, the admin or a cascade
+    if instance.returned_at is None:
+        ActiveBorrowingCount.objects.using(using).release({instance.user_id: 1})
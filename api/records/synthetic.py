@@ -0,0 +1,84 @@
+"""
+Synthetic borrowing history for the benchmark and plan-check commands.
+
+Like ``api.library_management.synthetic`` rows are produced server side with
+``generate_series``. Never point these helpers at production.
+"""
+
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from api.library_management.models import Book
+from .models import ActiveBorrowingCount, BorrowingRecord
+from .partitions import create_partitions
+
+
+@transaction.atomic
+def seed_borrowings(records, users=100_000, open_percent=3):
+    """
+    Insert synthetic users and ``records`` borrowings of existing books,
+    about ``open_percent`` of them not yet returned, and never more than
+    MAX_BOOKS_PER_USER open loans per user.
+    """
+    user_table = User._meta.db_table
+    record_table = BorrowingRecord._meta.db_table
+    # history reaches ten years back; give each month its partition
+    create_partitions(start=date.today() - timedelta(days=3660))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {user_table}
+                (password, is_superuser, username, first_name, last_name, email,
+                 is_staff, is_active, date_joined)
+            SELECT '!', false, 'synthetic-' || md5(random()::text || g), '', '',
+                   '', false, true, now()
+            FROM generate_series(1, %s) g
+            """,
+            [users],
+        )
+        cursor.execute(
+            f"""
+            WITH u AS (SELECT array_agg(id) AS ids FROM {user_table}
+                       WHERE username LIKE 'synthetic-%%'),
+                 b AS (SELECT array_agg(id) AS ids FROM {Book._meta.db_table}),
+                 series AS (
+                     SELECT g, now() - (g %% 3650) * interval '1 day' AS borrowed_at
+                     FROM generate_series(1, %s) g
+                 )
+            INSERT INTO {record_table}
+                (book_id, user_id, borrowed_at, due_date, returned_at,
+                 penalty_amount, updated_at)
+            SELECT b.ids[1 + (g * 7919) %% cardinality(b.ids)],
+                   u.ids[1 + g %% cardinality(u.ids)],
+                   borrowed_at,
+                   borrowed_at::date + 14,
+                   -- hashed, as g %% 100 would follow the user (g %% users)
+                   CASE WHEN (hashtext(g::text) & 2147483647) %% 100 < %s THEN NULL
+                        ELSE borrowed_at + (g %% 20) * interval '1 day' END,
+                   0,
+                   now()
+            FROM series, u, b
+            """,
+            [records, open_percent],
+        )
+        # a user's loans beyond the limit were returned a day after borrowing
+        cursor.execute(
+            f"""
+            UPDATE {record_table} AS r
+            SET returned_at = least(r.borrowed_at + interval '1 day', now())
+            FROM (
+                SELECT r.id, row_number() OVER (
+                    PARTITION BY r.user_id ORDER BY r.borrowed_at DESC, r.id DESC
+                ) AS n
+                FROM {record_table} AS r JOIN {user_table} AS u ON u.id = r.user_id
+                WHERE r.returned_at IS NULL AND u.username LIKE 'synthetic-%%'
+            ) AS ranked
+            WHERE r.id = ranked.id AND r.returned_at IS NULL AND ranked.n > %s
+            """,
+            [BorrowingRecord.MAX_BOOKS_PER_USER],
+        )
+        ActiveBorrowingCount.objects.rebuild()
+        for table in (user_table, record_table, ActiveBorrowingCount._meta.db_table):
+            cursor.execute(f"ANALYZE {table}")
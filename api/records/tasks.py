@@ -1,18 +1,46 @@
 # records/tasks.py
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import group, shared_task
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
+from django.db.models import Q
 from .models import BorrowingRecord
-from datetime import datetime, timedelta
+from . import borrowing_queue, outbox, partitions
+from datetime import date, timedelta
+from itertools import batched
+from smtplib import SMTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@shared_task
+def dispatch_outbox():
+    """
+    Deliver the pending outbox events, coalesced per user
+    """
+    delivered = outbox.dispatch()
+    logger.info(f"Dispatched {delivered} outbox events")
+    return delivered
+
+
+@shared_task
+def process_borrowing_queue():
+    """
+    Allocate the queued borrowing requests, one transaction per micro-batch
+    """
+    processed = borrowing_queue.drain()
+    if processed:
+        logger.info(f"Allocated {processed} queued borrowing requests")
+    return processed
+
+
 @shared_task
 def send_borrowing_confirmation(borrowing_ids):
     """
     Send confirmation emails for borrowings
+
+    Superseded by the outbox (dispatch_outbox); kept for messages that were
+    queued before it.
     """
     try:
         borrowings = BorrowingRecord.objects.filter(
@@ -45,41 +73,107 @@ def send_borrowing_confirmation(borrowing_ids):
         raise  # Re-raise to allow Celery retries
 
 
+REMINDER_DAYS_AHEAD = 3
+REMINDER_CHUNK_SIZE = 1000
+
+
+def due_soon(today):
+    """Open borrowings due within the reminder window and not reminded today."""
+    return BorrowingRecord.objects.filter(
+        Q(last_reminded_on__isnull=True) | Q(last_reminded_on__lt=today),
+        returned_at__isnull=True,
+        due_date__lte=today + timedelta(days=REMINDER_DAYS_AHEAD),
+        due_date__gte=today,
+    )
+
+
+def reminder_chunks(today, chunk_size=REMINDER_CHUNK_SIZE):
+    """``(first_id, last_id)`` ranges of at most ``chunk_size`` due-soon records."""
+    ids = (
+        due_soon(today)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=10_000)
+    )
+    return [(chunk[0], chunk[-1]) for chunk in batched(ids, chunk_size)]
+
+
 @shared_task
 def send_borrowing_reminders():
     """
     Send daily reminders for borrowings due within the next 3 days.
+
+    Fans the due-soon records out in id-keyed chunks, one task each.
     """
-    try:
-        today = datetime.now().date()
-        reminder_threshold = today + timedelta(days=3)
-        borrowings = BorrowingRecord.objects.filter(
-            returned_at__isnull=True,
-            due_date__lte=reminder_threshold,
-            due_date__gte=today,
-        ).select_related("user", "book")
+    today = date.today()
+    chunks = reminder_chunks(today)
+    group(
+        send_reminder_chunk.s(today.isoformat(), first_id, last_id)
+        for first_id, last_id in chunks
+    ).apply_async()
+    logger.info(f"Queued {len(chunks)} reminder chunks for {today}")
+    return len(chunks)
 
-        for borrowing in borrowings:
-            if not borrowing.user.email:
-                logger.warning(
-                    f"No email for user {borrowing.user.username} in borrowing {borrowing.id}"
-                )
-                continue
-            subject = "Book Return Reminder"
-            message = (
-                f"Dear {borrowing.user.username},\n\n"
-                f"Your borrowing of '{borrowing.book.title}' is due on "
-                f"{borrowing.due_date.strftime('%Y-%m-%d')}. "
-                f"Please return it on time to avoid penalties.\n\n"
-                f"Thank you!"
-            )
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [borrowing.user.email],
-                fail_silently=False,
-            )
+
+@shared_task(
+    bind=True,
+    autoretry_for=(SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=5,
+)
+def send_reminder_chunk(self, today, first_id, last_id):
+    """
+    Remind the due-soon records with ids in ``[first_id, last_id]`` over one
+    SMTP connection. Records are marked as they are sent, so a retry of the
+    chunk, or a rerun of the day, skips them.
+    """
+    today = date.fromisoformat(today)
+    borrowings = (
+        due_soon(today)
+        .filter(id__gte=first_id, id__lte=last_id)
+        .select_related("user", "book")
+        .order_by("id")
+    )
+    done = []
+    try:
+        with get_connection() as connection:
+            for borrowing in borrowings:
+                if borrowing.user.email:
+                    connection.send_messages([_reminder(borrowing)])
+                else:
+                    logger.warning(
+                        f"No email for user {borrowing.user.username} in borrowing {borrowing.id}"
+                    )
+                done.append(borrowing.id)
     except Exception as e:
-        logger.error(f"Error sending reminder emails: {e}")
-        raise
+        logger.error(
+            f"Error sending reminder emails for borrowings {first_id}-{last_id}: {e}"
+        )
+        raise  # Re-raise to allow Celery retries
+    finally:
+        BorrowingRecord.objects.filter(id__in=done).update(last_reminded_on=today)
+    return len(done)
+
+
+def _reminder(borrowing):
+    return EmailMessage(
+        "Book Return Reminder",
+        f"Dear {borrowing.user.username},\n\n"
+        f"Your borrowing of '{borrowing.book.title}' is due on "
+        f"{borrowing.due_date.strftime('%Y-%m-%d')}. "
+        f"Please return it on time to avoid penalties.\n\n"
+        f"Thank you!",
+        settings.DEFAULT_FROM_EMAIL,
+        [borrowing.user.email],
+    )
+
+
+@shared_task
+def maintain_borrowing_partitions():
+    """
+    Create the monthly partitions returned loans will move into next
+    """
+    created = partitions.create_partitions()
+    if created:
+        logger.info(f"Created borrowing partitions {', '.join(created)}")
+    return created
@@ -1,3 +1,235 @@
-from django.test import TestCase
+import re
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.library_management.models import Author, Book, Library
+from api.library_management.synthetic import seed_catalog
+from .admin import BorrowingRecordAdminForm
+from .models import ActiveBorrowingCount, BorrowingRecord
+from .services import BorrowingService
+from .synthetic import seed_borrowings
+from .tasks import dispatch_outbox
+
+LOCAL_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class BorrowingLimitConcurrencyTests(TransactionTestCase):
+    """The borrowing limit under parallel requests, on real transactions."""
+
+    THREADS = 8
+
+    def setUp(self):
+        # the confirmations are dispatched on commit; no broker here
+        patcher = mock.patch.object(dispatch_outbox, "delay")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(username="reader")
+        library = Library.objects.create(name="Main", address="", phone_number="")
+        author = Author.objects.create(name="Author")
+        self.books = Book.objects.bulk_create(
+            Book(
+                title=f"Book {n}",
+                author=author,
+                library=library,
+                published_date=date(2000, 1, 1),
+                available_copies=1,
+                isbn=f"limit-{n}",
+            )
+            for n in range(self.THREADS)
+        )
+        self.due_date = date.today() + timedelta(days=7)
+
+    def race(self, engine):
+        """One single-book borrow per thread, all released at once."""
+        start = threading.Barrier(self.THREADS)
+        borrowed = []
+
+        def borrow(book):
+            try:
+                start.wait()
+                BorrowingService.borrow_books(
+                    self.user, [book.id], self.due_date, engine=engine
+                )
+                borrowed.append(book.id)
+            except ValidationError:
+                pass
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=borrow, args=(book,)) for book in self.books]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return borrowed
+
+    def assert_limit_held(self, borrowed):
+        limit = BorrowingRecord.MAX_BOOKS_PER_USER
+        open_records = BorrowingRecord.objects.filter(
+            user=self.user, returned_at__isnull=True
+        ).count()
+        self.assertEqual(len(borrowed), limit)
+        self.assertEqual(open_records, limit)
+        self.assertEqual(
+            ActiveBorrowingCount.objects.get(user=self.user).active, open_records
+        )
+
+    def test_locking_engine_holds_the_limit(self):
+        self.assert_limit_held(self.race("locking"))
+
+    def test_conditional_engine_holds_the_limit(self):
+        self.assert_limit_held(self.race("conditional"))
+
+    def test_returns_free_the_slots(self):
+        self.race("locking")
+        BorrowingService.return_records(
+            list(
+                BorrowingRecord.objects.filter(user=self.user).values_list(
+                    "id", flat=True
+                )
+            )
+        )
+        self.assertEqual(ActiveBorrowingCount.objects.get(user=self.user).active, 0)
+        self.assert_limit_held(self.race("conditional"))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ActiveBorrowingCountSignalTests(TransactionTestCase):
+    """Records saved outside BorrowingService keep the counter in step."""
+
+    def setUp(self):
+        self.user = User.objects.create(username="reader")
+        library = Library.objects.create(name="Main", address="", phone_number="")
+        author = Author.objects.create(name="Author")
+        self.book = Book.objects.create(
+            title="Book",
+            author=author,
+            library=library,
+            published_date=date(2000, 1, 1),
+            available_copies=10,
+            isbn="signal-1",
+        )
+        self.due_date = date.today() + timedelta(days=7)
+
+    def active(self):
+        return ActiveBorrowingCount.objects.get(user=self.user).active
+
+    def test_created_record_takes_a_slot_and_deletion_frees_it(self):
+        record = BorrowingRecord.objects.create(
+            book=self.book, user=self.user, due_date=self.due_date
+        )
+        self.assertEqual(self.active(), 1)
+        record.delete()
+        self.assertEqual(self.active(), 0)
+
+    def test_record_beyond_the_limit_is_refused(self):
+        for _ in range(BorrowingRecord.MAX_BOOKS_PER_USER):
+            BorrowingRecord.objects.create(
+                book=self.book, user=self.user, due_date=self.due_date
+            )
+        with self.assertRaises(ValidationError):
+            BorrowingRecord.objects.create(
+                book=self.book, user=self.user, due_date=self.due_date
+            )
+        self.assertEqual(
+            BorrowingRecord.objects.filter(user=self.user).count(),
+            BorrowingRecord.MAX_BOOKS_PER_USER,
+        )
+        self.assertEqual(self.active(), BorrowingRecord.MAX_BOOKS_PER_USER)
+
+    def test_returned_and_updated_records_take_no_slot(self):
+        BorrowingRecord.objects.create(
+            book=self.book,
+            user=self.user,
+            due_date=self.due_date,
+            returned_at=timezone.now(),
+        )
+        record = BorrowingRecord.objects.create(
+            book=self.book, user=self.user, due_date=self.due_date
+        )
+        record.due_date += timedelta(days=1)
+        record.save()
+        self.assertEqual(self.active(), 1)
+
+    def test_returning_and_reopening_move_the_slot(self):
+        record = BorrowingRecord.objects.create(
+            book=self.book, user=self.user, due_date=self.due_date
+        )
+        record.returned_at = timezone.now()
+        record.save()
+        self.assertEqual(self.active(), 0)
+        record.returned_at = None
+        record.save()
+        self.assertEqual(self.active(), 1)
+
+    def test_admin_form_refuses_a_record_beyond_the_limit(self):
+        for _ in range(BorrowingRecord.MAX_BOOKS_PER_USER):
+            BorrowingRecord.objects.create(
+                book=self.book, user=self.user, due_date=self.due_date
+            )
+        form = BorrowingRecordAdminForm(
+            data={
+                "book": self.book.pk,
+                "user": self.user.pk,
+                "due_date": self.due_date.isoformat(),
+                "penalty_amount": "0.00",
+            }
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("__all__", form.errors)
+
+
+class BorrowingQueryPlanTests(TestCase):
+    """The hot open-loan queries are served by the partial indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(books=2_000, authors=200, libraries=10, categories=10)
+        seed_borrowings(50_000, users=5_000)
+        cls.user_id = (
+            BorrowingRecord.objects.filter(returned_at__isnull=True)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+
+    def used_indexes(self, queryset):
+        """Indexes in the plan, by the name they were declared under."""
+        names = re.findall(
+            r"(?:Index(?: Only)? Scan(?: Backward)? using|Bitmap Index Scan on)"
+            r" (\w+)",
+            queryset.explain(),
+        )
+        # partitions scan their own copy of each index declared on the table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname, parent.relname FROM pg_inherits i"
+                " JOIN pg_class child ON child.oid = i.inhrelid"
+                " JOIN pg_class parent ON parent.oid = i.inhparent"
+                " WHERE child.relname = ANY(%s)",
+                [names],
+            )
+            declared = dict(cursor.fetchall())
+        return {declared.get(name, name) for name in names}
+
+    def test_open_borrowings_of_a_user_use_the_open_user_index(self):
+        queryset = BorrowingRecord.objects.filter(
+            user_id=self.user_id, returned_at__isnull=True
+        )
+        self.assertIn("borrowing_open_user_idx", self.used_indexes(queryset))
+
+    def test_reminder_window_uses_the_open_due_date_index(self):
+        today = date.today()
+        queryset = BorrowingRecord.objects.filter(
+            returned_at__isnull=True,
+            due_date__gte=today,
+            due_date__lte=today + timedelta(days=3),
+        )
+        self.assertIn("borrowing_open_due_date_idx", self.used_indexes(queryset))
@@ -3,20 +3,36 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.shortcuts import get_object_or_404
 
-from .models import BorrowingRecord
+from .models import BorrowingRecord, BorrowingRequest
 from .serializers import (
     BorrowingRecordOutputSerializer,
+    BorrowingRequestSerializer,
     BulkBorrowingInputSerializer,
     BulkReturnInputSerializer,
 )
-from .services import BorrowingService
+from .services import BorrowingBusy, BorrowingService
+from . import borrowing_queue
+from api.library_management.models import Author, Book, Library
+from api.library_management.pagination import OptionalCursorPagination
+from api.library_management.eager_loading import EagerLoadingViewSetMixin
+from api.library_management.conditional import ConditionalGetMixin
+from api.library_management.fast_serialization import FastListMixin
+from api.library_management.exports import EXPORT_RENDERERS, ExportMixin
 
 logger = logging.getLogger(__name__)
 
 
-class BorrowingRecordViewSet(viewsets.ModelViewSet):
+class BorrowingRecordViewSet(
+    ConditionalGetMixin,
+    FastListMixin,
+    ExportMixin,
+    EagerLoadingViewSetMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet for managing borrowing records using ModelViewSet with overrides.
     Uses Service Layer for business logic.
@@ -26,16 +42,44 @@ class BorrowingRecordViewSet(viewsets.ModelViewSet):
     - DELETE /borrowings/{id}/: Delete a specific record.
     - PUT /borrowings/{id}/: Not Allowed.
     - PATCH /borrowings/{id}/: Not Allowed.
-    Includes a custom action for bulk returning books.
+    Includes a custom action for bulk returning books and
+    GET /borrowings/export/ streaming the full history as NDJSON or CSV.
     """
 
+    queryset = BorrowingRecord.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = OptionalCursorPagination
+    # the cursor seeks on borrowed_at; id only orders same-instant borrowings
+    cursor_ordering = ("-borrowed_at", "-id")
+    # is_overdue and penalty_amount change at midnight without any write
+    validators_vary_by_date = True
 
     def get_queryset(self):
-        """Return borrowing records for the currently authenticated user."""
-        return BorrowingRecord.objects.select_related(
-            "book", "book__author", "book__category", "book__library", "user"
-        ).filter(user=self.request.user)
+        """
+        Return borrowing records for the currently authenticated user.
+
+        The history spans open and returned loans, so it cannot be pruned
+        to one partition: each page probes borrowing_user_keyset_idx in
+        every month partition, and its cost grows with their number.
+        """
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_validator_querysets(self):
+        # each record renders its book with the author and library names
+        records = super().get_validator_querysets()
+        books = Book.objects.filter(id__in=records[0].values("book_id"))
+        return [
+            *records,
+            books,
+            Author.objects.filter(id__in=books.values("author_id")),
+            Library.objects.filter(id__in=books.values("library_id")),
+        ]
+
+    @action(detail=False, methods=["GET"], renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        """Streams the user's whole borrowing history, newest first."""
+        queryset = self.get_queryset().order_by("-borrowed_at", "-id")
+        return self.export_response(queryset, "borrowings")
 
     def get_serializer_class(self):
         """Return the appropriate serializer class based on the action."""
@@ -43,6 +87,8 @@ class BorrowingRecordViewSet(viewsets.ModelViewSet):
             return BulkBorrowingInputSerializer
         if self.action == "return_multiple":
             return BulkReturnInputSerializer
+        if self.action == "borrowing_request":
+            return BorrowingRequestSerializer
         return BorrowingRecordOutputSerializer
 
     def create(self, request, *args, **kwargs):
@@ -52,18 +98,23 @@ class BorrowingRecordViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         validated_data = serializer.validated_data
-        book_ids = [book.id for book in validated_data["book_ids"]]
+        # instances, so the service does not load the books again
+        books = validated_data["book_ids"]
         due_date = validated_data["due_date"]
         user = request.user
 
         try:
+            if settings.BORROWING_MODE == "queued":
+                return self.enqueue_response(user, books, due_date)
             created_records = BorrowingService.borrow_books(
-                user=user, book_ids=book_ids, due_date=due_date
+                user=user, book_ids=books, due_date=due_date
             )
             output_serializer = BorrowingRecordOutputSerializer(
                 created_records, many=True, context=self.get_serializer_context()
             )
             return Response(output_serializer.data, status=status.HTTP_201_CREATED)
+        except BorrowingBusy as e:
+            return self.busy_response(e)
         except ValidationError as e:
             error_detail = (
                 e.detail
@@ -88,6 +139,37 @@ class BorrowingRecordViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+    def enqueue_response(self, user, books, due_date):
+        """202 with the queued request, to be polled at its Location."""
+        borrowing_request = borrowing_queue.enqueue(user, books, due_date)
+        location = self.reverse_action(
+            "borrowing-request", kwargs={"request_id": borrowing_request.id}
+        )
+        return Response(
+            BorrowingRequestSerializer(
+                borrowing_request, context=self.get_serializer_context()
+            ).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": location},
+        )
+
+    @action(detail=False, methods=["GET"], url_path=r"requests/(?P<request_id>[0-9]+)")
+    def borrowing_request(self, request, request_id=None):
+        """Status of a borrow accepted in the queued mode, with its records."""
+        borrowing_request = get_object_or_404(
+            BorrowingRequest, pk=request_id, user=request.user
+        )
+        serializer = self.get_serializer(borrowing_request)
+        return Response(serializer.data)
+
+    def busy_response(self, error):
+        """503 for a lock timeout: nothing was written and a retry may succeed."""
+        return Response(
+            {"error": str(error)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+
     def update(self, request, *args, **kwargs):
         return Response(
             {"detail": 'Method "PUT" not allowed.'},
@@ -107,18 +189,19 @@ class BorrowingRecordViewSet(viewsets.ModelViewSet):
             data=request.data, context={"request": request}
         )
         serializer.is_valid(raise_exception=True)
-        record_ids_to_return = [
-            record.id for record in serializer.validated_data["record_ids"]
-        ]
+        records_to_return = serializer.validated_data["record_ids"]
+        record_ids_to_return = [record.id for record in records_to_return]
 
         try:
             returned_records = BorrowingService.return_records(
-                record_ids=record_ids_to_return
+                record_ids=records_to_return
             )
             output_serializer = BorrowingRecordOutputSerializer(
                 returned_records, many=True, context=self.get_serializer_context()
             )
             return Response(output_serializer.data, status=status.HTTP_200_OK)
+        except BorrowingBusy as e:
+            return self.busy_response(e)
         except ValidationError as e:
             error_detail = (
                 e.detail
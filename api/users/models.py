@@ -2,7 +2,6 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.geos import Point
-from django.contrib.gis.db.models.functions import Distance
 from api.library_management.models import Library
 
 
@@ -30,12 +29,13 @@ class UserLocation(models.Model):
         if not self.location:
             return Library.objects.none()
 
-        return (
-            Library.objects.filter(location__isnull=False)
-            .annotate(distance=Distance("location", self.location))
-            .filter(distance__lte=radius_km * 1000)  # Convert km to meters
-            .order_by("distance")
-        )
+        return Library.objects.within_radius(self.location, radius_km)
+
+    def get_nearest_libraries(self, limit=10):
+        if not self.location:
+            return Library.objects.none()
+
+        return Library.objects.nearest(self.location)[:limit]
 
     def __str__(self):
         return f"{self.user.username}'s location"
@@ -1,16 +1,20 @@
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.response import Response
+from api.library_management.eager_loading import EagerLoadingViewSetMixin
 from .models import UserLocation
 from .serializers import UserLocationSerializer
 
 
-class UserLocationViewSet(viewsets.ModelViewSet):
+class UserLocationViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = UserLocationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return UserLocation.objects.filter(user=self.request.user)
+        return self.with_eager_loading(
+            UserLocation.objects.filter(user=self.request.user)
+        )
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
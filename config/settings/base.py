@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.gis",
+    "django.contrib.postgres",
     # third-party apps
     "rest_framework",
     "rest_framework.authtoken",
@@ -64,6 +65,10 @@ REST_FRAMEWORK = {
         "dj_rest_auth.jwt_auth.JWTCookieAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.library_management.fast_serialization.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
 }
@@ -149,6 +154,26 @@ DATABASES = {
 }
 
 
+# Cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_CACHE_URL", "redis://localhost:6379/1"),
+    }
+}
+
+# Borrowing
+# "locking": select_for_update the books, then bulk_update them
+# "conditional": one guarded UPDATE ... RETURNING feeding the INSERT
+BORROWING_ENGINE = os.getenv("BORROWING_ENGINE", "locking")
+# fail with 503 instead of queueing on locked rows for longer; 0 waits forever
+BORROWING_LOCK_TIMEOUT_MS = int(os.getenv("BORROWING_LOCK_TIMEOUT_MS", "0"))
+# "sync": POST /borrowings/ borrows in the request
+# "queued": it answers 202 and a worker allocates requests in micro-batches
+BORROWING_MODE = os.getenv("BORROWING_MODE", "sync")
+BORROWING_QUEUE_BATCH_SIZE = int(os.getenv("BORROWING_QUEUE_BATCH_SIZE", "200"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 